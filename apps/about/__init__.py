@@ -4,7 +4,7 @@ import pyos
 def onStart(s, a):
     tmapp = s.getApplicationList().getApp("task-manager")
     ssapp = s.getApplicationList().getApp("state-shell")
-    sinf = open("res/system.json", "rU")
+    sinf = open("res/system.json", "r")
     #inf = pyos.json.loads(str(str(sinf.read(), errors="ignore")))
     inf = pyos.json.loads(sinf.read())    
     sinf.close()
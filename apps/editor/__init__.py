@@ -13,6 +13,7 @@ class Editor(object):
     def __init__(self):
         self.path = ""
         self.fobj = None
+        self.loader = None
         
         self.saved = False
         
@@ -36,6 +37,9 @@ class Editor(object):
     def save(self, btn=False):
         self.saved = btn
         if not self.saved: return
+        if self.isLoading():
+            pyos.GUI.WarningDialog("The file cannot be saved until it has finished opening.").display()
+            return
         if self.path == "":
             state.getApplicationList().getApp("files").getModule().SaveAs("Enter a name for the file. A common extension is .txt",
                                                                           onSelect=self.setPath).display()
@@ -55,7 +59,14 @@ class Editor(object):
     
     def open(self, path):
         self.path = path
-        ro = open(self.path, "rU")
-        self.textField.setText(ro.read())
+        ro = open(self.path, "r")
+        text = ro.read()
         ro.close()
-        self.fnText.setText(path[max(path.rfind("/"), path.rfind("\\"))+1:])
\ No newline at end of file
+        #Long files are loaded a few lines per frame, so the editor keeps drawing and taking input meanwhile.
+        if self.loader != None: self.loader.setStop()
+        self.loader = pyos.CoroutineTask(self.textField.loadText, text)
+        state.getThreadController().addThread(self.loader)
+        self.fnText.setText(path[max(path.rfind("/"), path.rfind("\\"))+1:])
+        
+    def isLoading(self):
+        return self.loader != None and not self.loader.stop
\ No newline at end of file
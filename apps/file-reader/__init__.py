@@ -5,7 +5,7 @@ app = None
 
 def loadFile(path):
     state.getGUI().displayStandbyText("Loading file")
-    f = open(path, "rU")
+    f = open(path, "r")
     contents = str(f.read())
     scroller = pyos.GUI.TextScrollableContainer((0, 0), width=app.ui.width, height=app.ui.height)
     scroller.getTextComponent().setText(contents)
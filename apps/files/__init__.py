@@ -170,6 +170,17 @@ class FileEntry(pyos.GUI.Container):
         self.addChild(self.text)
         self.addChild(self.sizeText)
         
+    def setPath(self, filepath):
+        self.absolutePath = filepath.replace("\\", "/")
+        self.shortPath = FileEntry.getFileName(self.absolutePath)
+        self.eventData["onLongClick"] = (self.shortPath, self.absolutePath)
+        if self.icon != None:
+            self.icon.setImage(surface=state.getIcons().getLoadedIcon("folder" if self.isDir() else "file"))
+        self.text.setText(self.shortPath)
+        self.text.eventData["onLongClick"] = (self.shortPath, self.absolutePath)
+        self.sizeText.setText(self.getSize())
+        self.sizeText.eventData["onLongClick"] = (self.shortPath, self.absolutePath)
+        
     def onSelect(self):
         if self.onSelected != None:
             self.onSelected(self)
@@ -205,9 +216,9 @@ class FileExplorer(pyos.GUI.Container):
         super(FileExplorer, self).__init__(position, **data)
         self.path = str(pyos.__file__).rstrip(".pyos.pyc").replace("\\", "/")
         self.selected = []
-        self.fileList = pyos.GUI.ListScrollableContainer((0, 40), width=self.computedWidth, height=self.computedHeight-40, color=state.getColorPalette().getColor("background"),
-                                                         margin=0, padding=0, scrollAmount=80,
-                                                         onLongClick=self.newFolderAsk)
+        self.fileList = pyos.GUI.VirtualListScrollableContainer((0, 40), width=self.computedWidth, height=self.computedHeight-40, color=state.getColorPalette().getColor("background"),
+                                                                scrollAmount=80, rowHeight=40, rowFactory=self.getEntry,
+                                                                onLongClick=self.newFolderAsk)
         self.addChild(self.fileList)
         self.generateButtonBar()
         self.appSupport = ApplicationSupport()
@@ -246,17 +257,32 @@ class FileExplorer(pyos.GUI.Container):
         folders = sorted([e for e in entries if pyos.os.path.isdir(pyos.os.path.join(self.path, e))])
         return folders + files
     
+    def getEntry(self, entry, index, row):
+        path = pyos.os.path.join(self.path, entry)
+        for selected in self.selected:
+            if selected.absolutePath == path.replace("\\", "/"):
+                return selected
+        #Selected entries may still be referenced by a pending copy or move, so they are never reused.
+        if row == None or row.selected:
+            return FileEntry((0, 0), path, width=self.fileList.container.computedWidth, height=40,
+                             color=state.getColorPalette().getColor("background"),
+                             onSelected=self.select, onDeselected=self.deselect,
+                             onClick=self.navToSub,
+                             onLongClick=self.renameAsk
+                             )
+        row.setPath(path)
+        return row
+    
+    def select(self, entry):
+        self.selected.append(entry)
+        
+    def deselect(self, entry):
+        self.selected.remove(entry)
+    
     def loadDir(self):
-        self.fileList.clearChildren()
-        for entry in self.scanDir():
-            entryContainer = FileEntry((0, -80), pyos.os.path.join(self.path, entry), width=self.fileList.container.computedWidth, height=40,
-                                             color=state.getColorPalette().getColor("background"), selected=(pyos.os.path.join(self.path, entry) in self.selected),
-                                             onSelected=self.selected.append, onDeselected=self.selected.remove,
-                                             onClick=self.navToSub,
-                                             onLongClick=self.renameAsk
-                                       )
-            self.fileList.addChild(entryContainer)
-        if self.fileList.container.childComponents == []:
+        entries = self.scanDir()
+        self.fileList.setDataSource(entries)
+        if entries == []:
             self.fileList.addChild(pyos.GUI.Text((2, 2), "This folder is empty.", state.getColorPalette().getColor("item")))
             
     def navUp(self):
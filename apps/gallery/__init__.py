@@ -50,6 +50,9 @@ class GalleryThumbnail(pyos.GUI.Container):
         
     def loadRealImage(self):
         img = aspect_scale(pyos.pygame.image.load(self.image), (self.width, self.height-20))
+        state.postToUI(self.setThumbnail, img)
+        
+    def setThumbnail(self, img):
         self.picture.setImage(surface=img, resize=True)
         self.picture.position[0] = pyos.GUI.getCenteredCoordinates(self.picture, self)[0]
         self.picture.position[1] = ((self.height-20)/2)-(self.picture.height/2)
@@ -19,7 +19,7 @@ def onUnload():
     state.getFunctionBar().clock_text.refresh()
     
 def run():
-    time = pyos.datetime.now()
+    time = state.getClock().now()
     timetuple = (3*time.hour, 3*time.minute, 4.25*time.second)
     inverse = (255-timetuple[0], 255-timetuple[1], 255-timetuple[2])
     state.getFunctionBar().container.backgroundColor = timetuple
@@ -59,6 +59,11 @@ def loadApps(pstate, app):
     application = state.getActiveApplication()
     application.ui.backgroundColor = state.getColorPalette().getColor("background")
     pagedContainer = pyos.GUI.GriddedPagedContainer((0, 0), 4, width=application.ui.width, height=application.ui.height, color=state.getColorPalette().getColor("background"))
+    application.ui.addChild(pagedContainer)
+    state.getThreadController().addThread(pyos.CoroutineTask(addAppPanes, pagedContainer))
+    
+def addAppPanes(pagedContainer):
+    #Build a few panes per frame so the launcher takes input while it fills in.
     for app in alphabetize(getVisibleAppList()):
         appPane = None
         if app in state.getApplicationList().activeApplications:
@@ -78,6 +83,6 @@ def loadApps(pstate, app):
         appPane.addChild(appIcon)
         appPane.addChild(appName)
         pagedContainer.addChild(appPane)
-    application.ui.addChild(pagedContainer)
-    pagedContainer.goToPage()
-    
\ No newline at end of file
+        if len(pagedContainer.pages) == 1 and len(pagedContainer.getPage(0).childComponents) == 1:
+            pagedContainer.goToPage()
+        yield
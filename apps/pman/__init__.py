@@ -1,6 +1,9 @@
 import pyos
 import urllib.request, urllib.error, urllib.parse
-from urllib.request import urlretrieve
+import http.client
+from threading import Lock, local
+from traceback import format_exception
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from apps.pman.fuzzywuzzy import fuzz
 from datetime import timedelta
 
@@ -19,23 +22,164 @@ Specified under the key "pman".
 """
 
 REPOS = []
+REPOS_PATH = "apps/pman/repos.json"
+CACHE_PATH = "apps/pman/cache.json"
+FETCH_WORKERS = 6 #Most requests in flight at once while the cache is updated
 
 def loadRepos():
     global REPOS
-    REPOS = fetchJSON("apps/pman/repos.json")["repos"]
+    REPOS = fetchJSON(REPOS_PATH)["repos"]
     
-def download(url, to):
+def download(url, to, timeout=30):
     try:
-        urlretrieve(url, to)
+        resource = urllib.request.urlopen(url, timeout=timeout)
+        body = resource.read()
+        resource.close()
+        f = open(to, "wb")
+        f.write(body)
+        f.close()
         return True
     except:
         return False
     
+class Fetcher(object):
+    #Fetches URLs on a few worker threads. Each worker keeps one persistent connection per host, so a repository's
+    #manifests come down over a handful of connections instead of one each. Does not need a running Python OS.
+    def __init__(self, workers=FETCH_WORKERS, timeout=10):
+        self.workers = workers
+        self.timeout = timeout
+        self.local = local()
+        self.connections = []
+        self.lock = Lock()
+        self.pool = None #Kept between map calls, so its threads keep their connections
+        
+    def getConnection(self, scheme, host):
+        connections = getattr(self.local, "connections", None)
+        if connections == None:
+            connections = self.local.connections = {}
+            with self.lock:
+                self.connections.append(connections)
+        if (scheme, host) not in connections:
+            if scheme == "https":
+                connection = http.client.HTTPSConnection(host, timeout=self.timeout)
+            else:
+                connection = http.client.HTTPConnection(host, timeout=self.timeout)
+            connection.answered = 0 #Responses read over this connection
+            connections[(scheme, host)] = connection
+        return connections[(scheme, host)]
+    
+    def dropConnection(self, scheme, host):
+        connection = self.local.connections.pop((scheme, host), None)
+        if connection != None: connection.close()
+        
+    def fetch(self, url, redirects=3):
+        #Returns the body as bytes, or None if it could not be fetched.
+        while True:
+            parts = urllib.parse.urlsplit(url)
+            path = (parts.path or "/") + ("?" + parts.query if parts.query else "")
+            connection = None
+            try:
+                connection = self.getConnection(parts.scheme, parts.netloc)
+                connection.request("GET", path)
+                response = connection.getresponse()
+                body = response.read()
+                connection.answered += 1
+            except (http.client.HTTPException, OSError, ValueError):
+                self.dropConnection(parts.scheme, parts.netloc)
+                #Only a kept-alive connection is worth a second try, as the server may have closed it since it was
+                #last used. A new connection that failed, to a host that is down or refusing, would fail again.
+                if connection != None and connection.answered > 0: continue
+                return None
+            if response.getheader("Connection", "").lower() == "close":
+                self.dropConnection(parts.scheme, parts.netloc)
+            if response.status in (301, 302, 303, 307, 308) and redirects > 0 and response.getheader("Location") != None:
+                url = urllib.parse.urljoin(url, response.getheader("Location"))
+                redirects -= 1
+                continue
+            return body if response.status == 200 else None
+        
+    def fetchJSON(self, url):
+        body = self.fetch(url)
+        if body == None: return None
+        try:
+            return pyos.json.loads(body.decode("utf-8", "ignore"))
+        except ValueError:
+            return None
+        
+    def map(self, method, items):
+        #Yields (item, method(item)) in the order they finish, with at most workers calls running at once. If the
+        #caller stops early, calls that have not started are cancelled and the failures of the rest are reported.
+        if self.pool == None: self.pool = ThreadPoolExecutor(max_workers=self.workers)
+        futures = dict((self.pool.submit(method, item), item) for item in items)
+        unread = set(futures)
+        try:
+            for future in as_completed(futures):
+                unread.discard(future)
+                yield futures[future], future.result()
+        finally:
+            for future in unread:
+                if not future.cancel():
+                    future.add_done_callback(Fetcher.reportUnread)
+                    
+    @staticmethod
+    def reportUnread(future):
+        if not future.cancelled() and future.exception() != None:
+            error = future.exception()
+            print("A fetch nobody waited for failed:\n" + "".join(format_exception(type(error), error, error.__traceback__)))
+            
+    def close(self):
+        if self.pool != None:
+            self.pool.shutdown(wait=True)
+            self.pool = None
+        with self.lock:
+            for connections in self.connections:
+                for connection in list(connections.values()):
+                    connection.close()
+                connections.clear()
+    
+def syncRepositories(repos, fetcher, report):
+    #Fetches the apps.json of every repository, then the app.json of every package they list, reporting progress
+    #and skipped entries through report. Returns the manifests by package name and the featured packages. Needs
+    #neither the UI nor a running Python OS, so it can be run against a local stand-in repository.
+    packages = {}
+    featured = []
+    listings = []
+    for repo, rman in fetcher.map(lambda repo: fetcher.fetchJSON(repo+"/apps.json"), repos):
+        if rman == None:
+            report("!!! "+repo+" could not be reached.")
+            continue
+        if not Cache.isListing(rman):
+            report("!!! "+repo+" does not have a valid apps.json.")
+            continue
+        report("R: "+repo+" ("+str(len(rman["apps"]))+" apps)")
+        listings += [(rapp, repo+"/"+urllib.parse.quote(rman["apps_dir"])+"/"+urllib.parse.quote(rapp)+"/") for rapp in rman["apps"]]
+        finf = rman.get("featured", None)
+        if isinstance(finf, str):
+            featured.append(finf)
+        elif isinstance(finf, list):
+            for f in finf: featured.append(f)
+        featuredList = rman.get("featured_list", [])
+        if isinstance(featuredList, list):
+            for f in featuredList: featured.append(f)
+    ca = 0
+    for (rapp, remotePath), aman in fetcher.map(lambda listing: fetcher.fetchJSON(listing[1]+"app.json"), listings):
+        ca += 1
+        if aman == None:
+            report("!!! A("+str(ca)+"/"+str(len(listings))+"): "+rapp+" could not be fetched.")
+        elif not Cache.isManifest(aman):
+            report("!!! A("+str(ca)+"/"+str(len(listings))+"): "+rapp+" does not have a valid app.json.")
+        else:
+            report("A("+str(ca)+"/"+str(len(listings))+"): "+rapp)
+            aman["remotePath"] = remotePath
+            packages[rapp] = aman
+    return packages, featured
+    
 def onStart(s, a):
-    global state, app, pman, cache
+    global state, app, pman, cache, catalog
     state = s
     app = a
     cache = Cache()
+    catalog = Catalog(cache, app.dataStore.get("featured", []))
     pman = PackageManager()
     pman.openScreen(MainScreen())
 
@@ -50,7 +194,7 @@ def fetchJSON(url):
     try:
         resource = None
         if pyos.os.path.exists(url):
-            resource = open(url, "rU")
+            resource = open(url, "rb") #Bytes, like urlopen
         else:
             resource = urllib.request.urlopen(url)
         text = str(str(resource.read(), errors="ignore"))
@@ -61,7 +205,7 @@ def fetchJSON(url):
     
 def readJSON(path):
     try:
-        f = open(path, "rU")
+        f = open(path, "rb")
         jsd = pyos.json.loads(str(str(f.read(), errors="ignore")))
         f.close()
         return jsd
@@ -86,6 +230,9 @@ class ProgressDialog(pyos.GUI.Overlay):
         self.addChild(self.clsbtn)
         
     def update(self, text):
+        state.postToUI(self.addLine, text)
+        
+    def addLine(self, text):
         self.text.setText(text + "\n" + self.text.text)
         self.tsc.refresh()
         if self.notification != None:
@@ -99,19 +246,38 @@ class ProgressDialog(pyos.GUI.Overlay):
                 state.getNotificationQueue().push(self.notification)
         
 class AppIcon(pyos.GUI.Image):
+    #Icons that are not on disk yet are downloaded on the Executor. The entry shows the unknown icon until then, so
+    #building it never waits on the network.
+    downloads = {} #Icon path to the future downloading it, shared by every entry showing that package
+    
     def __init__(self, position, appname, w=40, h=40, **data):
         if appname in list(state.getApplicationList().applications.values()):
             super(AppIcon, self).__init__(position, surface=state.getApplicationList().getApp(appname).getIcon(), width=w, height=h, **data)
-        else:
-            icn = cache.get(appname).get("more", {}).get("icon", "unknown")
-            if icn in list(state.getIcons().icons.values()):
-                super(AppIcon, self).__init__(position, path="res/icons/"+icn, width=w, height=h, **data)
-            else:                    
-                if pyos.os.path.exists("temp/pman_"+appname+"_icon.png") or download(cache.get(appname)["remotePath"]+"icon.png", "temp/pman_"+appname+"_icon.png"):
-                    try:
-                        super(AppIcon, self).__init__(position, path="temp/pman_"+appname+"_icon.png", width=w, height=h, **data)
-                    except:
-                        super(AppIcon, self).__init__(position, surface=state.getIcons().getLoadedIcon("unknown"), width=w, height=h, **data)
+            return
+        icn = catalog.get(appname).get("more", {}).get("icon", "unknown")
+        if icn in list(state.getIcons().icons.values()):
+            super(AppIcon, self).__init__(position, path="res/icons/"+icn, width=w, height=h, **data)
+            return
+        super(AppIcon, self).__init__(position, surface=state.getIcons().getLoadedIcon("unknown"), width=w, height=h, **data)
+        path = "temp/pman_"+appname+"_icon.png"
+        future = AppIcon.downloads.get(path)
+        if future == None and pyos.os.path.exists(path):
+            self.loadIcon(path)
+            return
+        if future == None or future.cancelled(): #Downloads started by an earlier run of pman are dropped when it closes
+            future = AppIcon.downloads[path] = state.getExecutor().submit(download, catalog.get(appname)["remotePath"]+"icon.png", path)
+        future.add_done_callback(lambda future: self.iconDownloaded(path, future))
+        
+    def iconDownloaded(self, path, future):
+        if AppIcon.downloads.get(path) is future: del AppIcon.downloads[path]
+        if future.cancelled(): return
+        if future.result(): self.loadIcon(path)
+        
+    def loadIcon(self, path):
+        try:
+            self.setImage(path=path)
+        except:
+            pass #A broken download keeps the unknown icon
                     
 class AppActionButton(pyos.GUI.Button):
     def __init__(self, position, appname, w, h):
@@ -120,9 +286,9 @@ class AppActionButton(pyos.GUI.Button):
         self.refresh()
         
     def refresh(self):
-        if self.app in list(state.getApplicationList().applications.keys()):
+        if catalog.isInstalled(self.app):
             self.backgroundColor = (200, 250, 200)
-            if float(cache.get(self.app).get("version", 0.0)) > state.getApplicationList().getApp(self.app).version:
+            if catalog.isUpdatable(self.app):
                 self.setOnClick(Installer(self.app).start)
                 self.setText("Update")
             else:
@@ -140,7 +306,7 @@ class UIParts:
         if fits == "appui": fits = app.ui
         cont = pyos.GUI.Container((0, 0), width=fits.computedWidth, height=20, border=1, onClick=onC)
         cont.addChild(AppIcon((0, 0), appname, 20, 20, onClick=onC))
-        cont.addChild(pyos.GUI.Text((22, 2), cache.get(appname)["title"], pyos.DEFAULT, 16, onClick=onC))
+        cont.addChild(pyos.GUI.Text((22, 2), catalog.get(appname)["title"], pyos.DEFAULT, 16, onClick=onC))
         cont.addChild(AppActionButton((cont.computedWidth-40, 0), appname, 40, 20))
         return cont
     
@@ -149,8 +315,8 @@ class UIParts:
         if fits == "appui": fits = app.ui
         cont = pyos.GUI.Container((0, 0), width=fits.computedWidth, height=40, border=1, onClick=onC)
         cont.addChild(AppIcon((0, 0), appname, 40, 40, onClick=onC))
-        cont.addChild(pyos.GUI.Text((42, 2), cache.get(appname)["title"], pyos.DEFAULT, 18, onClick=onC))
-        cont.addChild(pyos.GUI.Text((42, 22), cache.get(appname)["author"], pyos.DEFAULT, 14, onClick=onC))
+        cont.addChild(pyos.GUI.Text((42, 2), catalog.get(appname)["title"], pyos.DEFAULT, 18, onClick=onC))
+        cont.addChild(pyos.GUI.Text((42, 22), catalog.get(appname)["author"], pyos.DEFAULT, 14, onClick=onC))
         cont.addChild(AppActionButton((cont.computedWidth-60, 0), appname, 60, 40))
         return cont
     
@@ -159,10 +325,10 @@ class UIParts:
         if fits == "appui": fits = app.ui
         cont = pyos.GUI.Container((0, 0), width=fits.computedWidth, height=64, border=1, onClick=onC)
         cont.addChild(AppIcon((0, 0), appname, 40, 40, onClick=onC))
-        cont.addChild(pyos.GUI.Text((42, 2), cache.get(appname)["title"], pyos.DEFAULT, 18, onClick=onC))
-        cont.addChild(pyos.GUI.Text((42, 22), cache.get(appname)["author"], pyos.DEFAULT, 14, onClick=onC))
+        cont.addChild(pyos.GUI.Text((42, 2), catalog.get(appname)["title"], pyos.DEFAULT, 18, onClick=onC))
+        cont.addChild(pyos.GUI.Text((42, 22), catalog.get(appname)["author"], pyos.DEFAULT, 14, onClick=onC))
         cont.addChild(AppActionButton((cont.computedWidth-60, 0), appname, 60, 40))
-        dt = cache.get(appname).get("description", "No Description.")
+        dt = catalog.get(appname).get("description", "No Description.")
         cont.addChild(pyos.GUI.MultiLineText((2, 40), dt[:dt.find(".")], pyos.DEFAULT, 12, width=cont.computedWidth, height=24))
         return cont
     
@@ -206,25 +372,47 @@ class Screen(pyos.GUI.Container):
     def deactivate(self):
         state.getFunctionBar().app_title_text.setText(self.oldtitle)
         
+    def startLoad(self, sel, selWidth):
+        if sel != None: app.dataStore["sel_size"] = sel
+        self.removeChild(self.sizesel)
+        self.sizesel = SizeSelector((app.ui.width-selWidth, 0), selWidth, 40, self.bgLoad)
+        self.addChild(self.sizesel)
+        self.scroller.clearChildren()
+        self.loadingText = pyos.GUI.Text((0, 0), "Loading...")
+        self.scroller.addChild(self.loadingText)
+        
+    def addEntry(self, appname):
+        #The package's own screen is only built if its entry is opened.
+        if catalog.get(appname) == None: return #Dropped by a sync since the screen started loading
+        self.scroller.addChild(self.sizesel.getEntry(appname, lambda: AppScreen.ondemand(appname), self.scroller.container))
+        
+    def finishLoad(self, status=None):
+        if status != None: self.statustxt.setText(status)
+        self.scroller.removeChild(self.loadingText)
+        
 class AppScreen(Screen):
     def __init__(self, appname):
         self.appname = appname
-        super(AppScreen, self).__init__(cache.get(appname).get("title", appname))
+        super(AppScreen, self).__init__(catalog.get(appname).get("title", appname))
         self.refresh()
         
+    @staticmethod
+    def ondemand(appname):
+        AppScreen(appname).activate()
+        
     def refresh(self):
         self.clearChildren()
-        self.data = cache.get(self.appname)
+        self.data = catalog.get(self.appname)
         self.addChild(UIParts.normalAppEntry(self.appname, pyos.Application.dummy))
         self.addChild(pyos.GUI.Text((2, 42), "Package: "+self.appname))
         self.addChild(pyos.GUI.Text((2, 58), "Version "+str(self.data.get("version", 0.0))))
-        if self.appname in app.dataStore.get("featured", []): self.addChild(pyos.GUI.Text((2, 74), "Featured", (250, 150, 150)))
+        if catalog.isFeatured(self.appname): self.addChild(pyos.GUI.Text((2, 74), "Featured", (250, 150, 150)))
         self.addChild(pyos.GUI.MultiLineText((2, 90), self.data.get("description", "No Description"), width=app.ui.width, height=(app.ui.height-130)))
         self.addChild(BackBtn((0, self.height-40)))
         self.addChild(pyos.GUI.Button((40, self.height-40), "More by "+self.data.get("author"),
                                       state.getColorPalette().getColor("dark:background"), width=app.ui.width-40, height=40,
                                       onClick=AppListScreen.ondemand,
-                                      onClickData=([a for a in list(cache.data.keys()) if cache.get(a).get("author") == self.data.get("author")],)))
+                                      onClickData=(catalog.getByAuthor(self.data.get("author")),)))
         
 class UpdateScreen(Screen):
     def __init__(self):
@@ -236,20 +424,12 @@ class UpdateScreen(Screen):
         UpdateScreen().activate()
         
     def bgLoad(self, sel=None):
-        if sel != None: app.dataStore["sel_size"] = sel
-        self.removeChild(self.sizesel)
-        self.sizesel = SizeSelector((app.ui.width-100, 0), 100, 40, self.bgLoad)
-        self.addChild(self.sizesel)
-        self.scroller.clearChildren()
-        txt = pyos.GUI.Text((0, 0), "Loading...")
-        self.scroller.addChild(txt)
+        state.postToUI(self.startLoad, sel, 100)
         au = 0
-        for lapp in sorted(state.getApplicationList().getApplicationList(), key=lambda x: x.title):
-            if cache.get(lapp.name).get("version", 0.0) > lapp.version:
-                self.scroller.addChild(self.sizesel.getEntry(lapp.name, AppScreen(lapp.name).activate, self.scroller.container))
-                au += 1
-        self.statustxt.setText(str(au)+" Updates")
-        self.scroller.removeChild(txt)
+        for name in catalog.getUpdatable():
+            state.postToUI(self.addEntry, name)
+            au += 1
+        state.postToUI(self.finishLoad, str(au)+" Updates")
         
     def refresh(self):
         self.clearChildren()
@@ -271,19 +451,13 @@ class AppListScreen(Screen):
         AppListScreen(apps).activate()
         
     def bgLoad(self, sel=None):
-        if sel != None: app.dataStore["sel_size"] = sel
-        self.removeChild(self.sizesel)
-        self.sizesel = SizeSelector((app.ui.width-100, 0), 100, 40, self.bgLoad)
-        self.addChild(self.sizesel)
-        self.scroller.clearChildren()
-        txt = pyos.GUI.Text((0, 0), "Loading...")
-        self.scroller.addChild(txt)
+        state.postToUI(self.startLoad, sel, 100)
+        index = catalog.getIndex()
         au = 0
-        for a in sorted(self.apps, key=lambda x: cache.get(x, {"title": x}).get("title")):
-            self.scroller.addChild(self.sizesel.getEntry(a, AppScreen(a).activate, self.scroller.container))
+        for a in sorted(self.apps, key=lambda x: index.get(x, {"title": x}).get("title")):
+            state.postToUI(self.addEntry, a)
             au += 1
-        self.statustxt.setText(str(au)+" Apps")
-        self.scroller.removeChild(txt)
+        state.postToUI(self.finishLoad, str(au)+" Apps")
         
     def refresh(self):
         self.clearChildren()
@@ -305,24 +479,20 @@ class SearchScreen(Screen):
         SearchScreen(query).activate()
         
     def bgLoad(self, sel=None):
-        if sel != None: app.dataStore["sel_size"] = sel
-        self.removeChild(self.sizesel)
-        self.sizesel = SizeSelector((app.ui.width-80, 0), 80, 40, self.bgLoad)
-        self.addChild(self.sizesel)
-        self.scroller.clearChildren()
-        txt = pyos.GUI.Text((0, 0), "Loading...")
-        self.scroller.addChild(txt)
+        state.postToUI(self.startLoad, sel, 80)
+        index = catalog.getIndex()
         results = {}
-        for a in list(cache.data.keys()):
+        for a in index.getNames():
+            title, description, author = index.getSearchText(a)
             r = fuzz.ratio(self.query, a)
-            r += fuzz.ratio(self.query, cache.get(a).get("title").lower())
-            r += fuzz.token_sort_ratio(self.query, cache.get(a).get("description", "").lower())
-            ar = fuzz.ratio(self.query, cache.get(a).get("author", "").lower())
+            r += fuzz.ratio(self.query, title)
+            r += fuzz.token_sort_ratio(self.query, description)
+            ar = fuzz.ratio(self.query, author)
             if r >110 or ar > 60:
                 results[a] = r+ar
         for ra in sorted(list(results.keys()), key=lambda x: results[x], reverse=True):
-            self.scroller.addChild(self.sizesel.getEntry(ra, AppScreen(ra).activate, self.scroller.container))
-        self.scroller.removeChild(txt)
+            state.postToUI(self.addEntry, ra)
+        state.postToUI(self.finishLoad)
         
     def setQuery(self):
         self.query = self.statustxt.getText().lower()
@@ -355,18 +525,18 @@ class MainScreen(Screen):
             self.featuredHerald.addChild(pyos.GUI.Text((2, 2), "Featured Apps", pyos.DEFAULT, 16))
             self.featuredShowcase = pyos.GUI.ListPagedContainer((0, 20), width=self.width, height=90,
                                                                 border=1, borderColor=(51, 183, 255))
-            if app.dataStore.get("featured", []) == []:
+            if catalog.getFeatured() == []:
                 self.featuredShowcase.addChild(pyos.GUI.Text((5, 5), "No Featured Apps."))
             else:
-                for fa in app.dataStore.get("featured", []):
-                    self.featuredShowcase.addChild(UIParts.largeAppEntry(fa, AppScreen(fa).activate))
+                for fa in catalog.getFeatured():
+                    self.featuredShowcase.addChild(UIParts.largeAppEntry(fa, lambda fa=fa: AppScreen.ondemand(fa)))
             self.featuredShowcase.goToPage()
             self.addChild(self.featuredHerald)
             self.addChild(self.featuredShowcase)
             self.addChild(pyos.GUI.Button((0, self.height-120), "Updates", (255, 187, 59), width=self.width/2, height=40,
                                           onClick=UpdateScreen.ondemand))
             self.addChild(pyos.GUI.Button((self.width/2, self.height-120), "All Apps", (148, 143, 133), width=self.width/2, height=40,
-                                          onClick=AppListScreen.ondemand, onClickData=(list(cache.data.keys()),)))
+                                          onClick=AppListScreen.ondemand, onClickData=(catalog.getNames(),)))
             self.searchBar = pyos.GUI.TextEntryField((0, self.height-160), "", width=self.width-40, height=40)
             self.addChild(pyos.GUI.Image((self.width-40, self.height-160), surface=state.getIcons().getLoadedIcon("search"),
                                          onClick=self.search))
@@ -383,12 +553,11 @@ class MainScreen(Screen):
     
 class Cache(pyos.DataStore):
     def __init__(self, doDialog=True):
-        self.dsPath = "apps/pman/cache.json"
-        self.application = app
+        super(Cache, self).__init__(app)
+        self.dsPath = CACHE_PATH
         self.featured = []
         self.progressInfo = "Updating Cache"
         self.dialog = None if not doDialog else ProgressDialog()
-        self.data = {}
         
     def setPrgInfo(self, txt):
         print(txt)
@@ -400,36 +569,23 @@ class Cache(pyos.DataStore):
                 self.dialog = ProgressDialog()
         
     def update(self):
-        self.data = {}
-        self.featured = []
         if self.dialog != None:
             self.dialog.display()
+        fetcher = Fetcher()
+        try:
+            packages, featured = syncRepositories(REPOS, fetcher, self.setPrgInfo)
+        except Exception as error:
+            #The cached listings are only replaced by a sync that finished.
+            self.setPrgInfo("!!! The update failed: "+str(error))
+            self.setPrgInfo("Done.")
+            return
+        finally:
+            fetcher.close()
+        self.data = packages
+        self.featured = featured
         self.saveStore()
-        cr = 0
-        for repo in REPOS:
-            cr += 1
-            self.setPrgInfo("R("+str(cr)+"): "+repo)
-            if download(repo+"/apps.json", "temp/apps.json"):
-                ca = 0
-                rman = readJSON("temp/apps.json")
-                for rapp in rman["apps"]:
-                    ca += 1
-                    self.setPrgInfo("R("+str(cr)+") A("+str(ca)+"): "+rapp)
-                    if download(repo+"/"+rman["apps_dir"]+"/"+rapp+"/app.json", "temp/app.json"):
-                        aman = readJSON("temp/app.json")
-                        aman["remotePath"] = repo+"/"+rman["apps_dir"]+"/"+rapp+"/"
-                        self.set(rapp, aman)
-                finf = rman.get("featured", None)
-                if finf != None:
-                    if isinstance(finf, str):
-                        self.featured.append(rman["featured"])
-                    else:
-                        for f in rman["featured"]: self.featured.append(f)
-                for f in rman.get("featured_list", []): self.featured.append(f)
         self.setPrgInfo("Cleaning Up...")
         try:
-            pyos.os.remove("temp/apps.json")
-            pyos.os.remove("temp/app.json")
             for trc in pyos.os.listdir("temp/"):
                 if trc.startswith("pman_"):
                     pyos.os.remove("temp/"+trc)
@@ -437,12 +593,116 @@ class Cache(pyos.DataStore):
             pass
         app.dataStore["lastUpdate"] = pyos.datetime.strftime(pyos.datetime.now(), "%a %b %d %H:%M:%S %Y")
         app.dataStore["featured"] = self.featured
+        state.postToUI(catalog.reload, self.featured)
         self.setPrgInfo("Done.")
-        pman.refresh()
+        state.postToUI(pman.refresh)
+        
+    @staticmethod
+    def isListing(rman):
+        #A repository's apps.json, as far as update reads it.
+        return isinstance(rman, dict) and isinstance(rman.get("apps_dir"), str) and isinstance(rman.get("apps"), list) and \
+               all(isinstance(rapp, str) for rapp in rman["apps"])
+    
+    @staticmethod
+    def isManifest(aman):
+        #A package's app.json needs the fields the package screens show.
+        return isinstance(aman, dict) and isinstance(aman.get("title"), str) and isinstance(aman.get("author"), str)
         
     def bgUpdate(self):
         state.getThreadController().addThread(pyos.ParallelTask(self.update))
         
+class CatalogIndex(object):
+    #One consistent set of lookups over the listings. It is built whole and never changed afterwards, so a screen
+    #loading on another thread takes one with Catalog.getIndex and makes all of its lookups on it.
+    def __init__(self, packages, featured):
+        self.packages = packages
+        self.searchText = {}
+        self.byAuthor = {}
+        for name, data in packages.items():
+            self.searchText[name] = (data.get("title", name).lower(), data.get("description", "").lower(), data.get("author", "").lower())
+            self.byAuthor.setdefault(data.get("author"), []).append(name)
+        self.featured = [name for name in featured if name in packages]
+        self.featuredSet = set(self.featured)
+        apps = state.getApplicationList()
+        self.installed = set(name for name in apps.getApplicationNames() if name in packages)
+        self.updatableSet = set(name for name in self.installed if float(packages[name].get("version", 0.0)) > apps.getApp(name).version)
+        self.updatable = sorted(self.updatableSet, key=lambda name: apps.getApp(name).title)
+        
+    def get(self, name, default=None):
+        return self.packages.get(name, default)
+    
+    def getNames(self):
+        return list(self.packages.keys())
+    
+    def getSearchText(self, name):
+        #Lowercased title, description and author.
+        return self.searchText[name]
+    
+    def getByAuthor(self, author):
+        return list(self.byAuthor.get(author, []))
+    
+    def getFeatured(self):
+        return self.featured
+    
+    def isFeatured(self, name):
+        return name in self.featuredSet
+    
+    def isInstalled(self, name):
+        return name in self.installed
+    
+    def getUpdatable(self):
+        return self.updatable
+    
+    def isUpdatable(self, name):
+        return name in self.updatableSet
+        
+class Catalog(object):
+    #The cached repository listings, read from the Cache once, with the lookups the screens make. Indexes are built
+    #on the main loop, as they read the application list. Each lookup here reads the current index; work that makes
+    #several lookups off the main loop takes the index once with getIndex instead.
+    def __init__(self, store, featured):
+        self.store = store
+        self.index = None
+        self.reload(featured)
+        
+    def reload(self, featured):
+        packages = dict((name, data) for name, data in self.store.getStore().items() if isinstance(data, dict))
+        self.index = CatalogIndex(packages, featured)
+        
+    def refreshInstalled(self):
+        #Installs change the installed versions but not the listings.
+        self.index = CatalogIndex(self.index.packages, self.index.featured)
+        
+    def getIndex(self):
+        return self.index
+        
+    def get(self, name, default=None):
+        return self.index.get(name, default)
+    
+    def getNames(self):
+        return self.index.getNames()
+    
+    def getSearchText(self, name):
+        return self.index.getSearchText(name)
+    
+    def getByAuthor(self, author):
+        return self.index.getByAuthor(author)
+    
+    def getFeatured(self):
+        return self.index.getFeatured()
+    
+    def isFeatured(self, name):
+        return self.index.isFeatured(name)
+    
+    def isInstalled(self, name):
+        return self.index.isInstalled(name)
+    
+    def getUpdatable(self):
+        return self.index.getUpdatable()
+    
+    def isUpdatable(self, name):
+        return self.index.isUpdatable(name)
+        
 class Installer(object):
     def __init__(self, appname, local=False):
         self.local = local
@@ -478,14 +738,14 @@ class Installer(object):
         
     @staticmethod
     def getDependencies(appname):
-        deps = cache.get(appname).get("pman", {}).get("depends", [])
+        deps = list(catalog.get(appname).get("pman", {}).get("depends", [])) #Changed below, so not the manifest's own list
         print(appname + " depends on " + str(deps))
         for d in deps:
             if d == appname:
                 print("Warning: The app "+appname+" depends on itself.")
                 deps.remove(d)
                 continue
-            sd = cache.get(d).get("pman", {}).get("depends", [])
+            sd = catalog.get(d).get("pman", {}).get("depends", [])
             for s in sd:
                 if s not in deps and s != appname: 
                     deps.append(s)
@@ -502,14 +762,14 @@ class Installer(object):
         toinst = [self.name] + deps
         post_install = []
         for tia in toinst:
-            if not self.local and tia in state.getApplicationList().getApplicationNames() and cache.get(tia).get("version") <= state.getApplicationList().getApp(tia).version:
+            if not self.local and tia in state.getApplicationList().getApplicationNames() and catalog.get(tia).get("version") <= state.getApplicationList().getApp(tia).version:
                 print(tia + " is already installed at the newest version.")
                 toinst.remove(tia)
                 continue
-            if cache.get(tia).get("pman", {}).get("min_os", 0.0) > pman.sysInf.get("version"):
+            if catalog.get(tia).get("pman", {}).get("min_os", 0.0) > pman.sysInf.get("version"):
                 self.dialog.update("!!! The install cannot continue because the package "+tia+" requires a newer version of Python OS.")
                 return
-            pim = cache.get(tia).get("pman", {}).get("onInstalled", None)
+            pim = catalog.get(tia).get("pman", {}).get("onInstalled", None)
             if pim != None:
                 post_install.append([tia, pim])
         if toinst == []:
@@ -535,7 +795,7 @@ class Installer(object):
                     pass
                 c += 1
                 continue
-            if download(cache.get(package)["remotePath"]+package+".zip", "temp/pman_package.zip"):
+            if download(catalog.get(package)["remotePath"]+urllib.parse.quote(package)+".zip", "temp/pman_package.zip"):
                 self.dialog.update("... Downloaded.")
                 try:
                     pyos.Application.install("temp/pman_package.zip")
@@ -560,9 +820,10 @@ class Installer(object):
         except:
             pass
         state.getApplicationList().reloadList()
+        state.postToUI(catalog.refreshInstalled)
         self.dialog.update("Done.")
         self.dialog.hide(True)
-        pman.refresh()
+        state.postToUI(pman.refresh)
         
 class PackageManager(object):
     def __init__(self):
@@ -1,4 +1,4 @@
-import pyos, datetime
+import pyos
 
 def onStart(s, a):
     global state, app, watch
@@ -45,12 +45,12 @@ class Stopwatch(object):
         if self.started:
             self.startBtn.setText("Resume")
             self.started = False
-            self.pauseTime = datetime.datetime.now()
+            self.pauseTime = state.getClock().now()
         else:
             if self.time_text.text == "00:00.00":
-                self.startTime = datetime.datetime.now()
+                self.startTime = state.getClock().now()
             else:
-                self.startTime = datetime.datetime.now() - (self.pauseTime - self.startTime)
+                self.startTime = state.getClock().now() - (self.pauseTime - self.startTime)
             self.started = True
             self.startBtn.setText("Pause")
         self.startBtn.refresh()
@@ -63,13 +63,13 @@ class Stopwatch(object):
         
     def lap(self):
         if not self.started: return
-        timed = datetime.datetime.now() - self.startTime
+        timed = state.getClock().now() - self.startTime
         lap = Lap(self, timed.seconds/60, timed.seconds%60, timed.microseconds % 1000000)
         self.lapContainer.addChild(lap)
         
     def update(self):
         if not self.started: return
-        timed = datetime.datetime.now() - self.startTime
+        timed = state.getClock().now() - self.startTime
         self.time_text.text = str(timed.seconds/60).rjust(2, "0")+":"+str(timed.seconds%60).rjust(2, "0")+"."+str(timed.microseconds % 1000000)[:2]
         self.time_text.refresh()
         
@@ -3,6 +3,10 @@ import pyos
 state = None
 app = None
 
+def isStopped(a):
+    #Apps that were never opened have no thread yet, and are not loaded just to be listed.
+    return not a.isLoaded() or a.thread.stop or a.thread.firstRun
+
 def buildAppEntry(a):
     cont = pyos.GUI.Container((0, 0), color=state.getColorPalette().getColor("background"), width=app.ui.width-2, height=40)
     ic = a.getIcon()
@@ -18,10 +22,10 @@ def buildAppEntry(a):
     stopBtn = pyos.GUI.Button((app.ui.width-50, 0), "Stop", state.getColorPalette().getColor("background"), state.getColorPalette().getColor("item"),
                                20, width=50, height=40, border=1, borderColor=state.getColorPalette().getColor("accent"),
                                onClick=registerStopClick, onClickData=(a, cont))
-    if a.thread.pause:
+    if a.isLoaded() and a.thread.pause:
         pauseBtn.textComponent.text = "Resume"
         pauseBtn.refresh()
-    if a.thread.stop or a.thread.firstRun:
+    if isStopped(a):
         stopBtn.textComponent.text = "Start"
         pauseBtn.refresh()
         pauseBtn.textComponent.text = " - "
@@ -34,7 +38,7 @@ def buildAppEntry(a):
 
 def registerPauseClick(a, cont):
     pauseBtn = cont.getChildAt([app.ui.width-100, 0])
-    if a.thread.stop or a.thread.firstRun: return
+    if isStopped(a): return
     if a.thread.pause:
         a.activate()
         pauseBtn.textComponent.text = "Pause"
@@ -47,7 +51,7 @@ def registerPauseClick(a, cont):
 def registerStopClick(a, cont):
     pauseBtn = cont.getChildAt([app.ui.width-100, 0])
     stopBtn = cont.getChildAt([app.ui.width-50, 0])
-    if a.thread.stop or a.thread.firstRun:
+    if isStopped(a):
         a.activate()
         stopBtn.textComponent.text = "Stop"
         stopBtn.refresh()
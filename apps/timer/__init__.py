@@ -14,7 +14,7 @@ def showNotification():
     
 def setNotification():
     if not timer.started: return
-    task = pyos.TimedTask(datetime.datetime.now() + datetime.timedelta(minutes=int(timer.min_text.text.rstrip("m")), seconds=int(timer.sec_text.text.rstrip("s"))),
+    task = pyos.TimedTask(state.getClock().now() + datetime.timedelta(minutes=int(timer.min_text.text.rstrip("m")), seconds=int(timer.sec_text.text.rstrip("s"))),
                           showNotification)
     state.getThreadController().addThread(task)
     
@@ -63,7 +63,7 @@ class Timer(object):
             self.started = False
         else:
             if self.sec_text.text == "00s" and self.min_text.text == "00m": return
-            now = datetime.datetime.now()
+            now = state.getClock().now()
             if self.startBtn.textComponent.text == "Resume":
                 self.endDelta = now + datetime.timedelta(minutes=int(self.min_text.text.rstrip("m")), seconds=int(self.sec_text.text.rstrip("s")))
             else:
@@ -107,7 +107,7 @@ class Timer(object):
     
     def update(self):
         if not self.started: return
-        timed = self.endDelta - datetime.datetime.now()
+        timed = self.endDelta - state.getClock().now()
         if timed.total_seconds() <= 1:
             app.ui.backgroundColor = (240, 98, 108)
             self.min_text.text = "00m"
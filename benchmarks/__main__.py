@@ -0,0 +1,116 @@
+'''
+Runs the Python OS benchmark scenarios and writes the results as JSON.
+
+    python -m benchmarks                         Run every scenario
+    python -m benchmarks files-10k gallery-paging
+    python -m benchmarks --list
+    python -m benchmarks --replay temp/events-<time>.evlog
+    python -m benchmarks --compare old.json new.json
+
+Each scenario runs in its own process, so boot state and peak RSS are not shared between them.
+'''
+import os
+import sys
+import argparse
+from subprocess import call, TimeoutExpired
+from tempfile import mkstemp
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+CWD = os.getcwd()
+os.chdir(ROOT)
+if ROOT not in sys.path: sys.path.insert(0, ROOT)
+
+from benchmarks import harness
+from benchmarks.scenarios import SCENARIOS, EventLogReplay
+
+def parseSize(text):
+    width, height = text.lower().split("x")
+    return (int(width), int(height))
+
+def runChild(name, size, replay=None, timeout=harness.SCENARIO_TIMEOUT):
+    handle, path = mkstemp(suffix=".json")
+    os.close(handle)
+    try:
+        try:
+            code = call([sys.executable, "-m", "benchmarks", "--child", name, "--size", "%dx%d" % size, "--output", path] +
+                        (["--replay", replay] if replay != None else []), timeout=timeout)
+        except TimeoutExpired:
+            #call has already killed the process.
+            return {"name": name, "error": "Timed out after %d seconds" % timeout}
+        try:
+            return harness.readResults(path)
+        except:
+            return {"name": name, "error": "Benchmark process exited with code " + str(code)}
+    finally:
+        os.remove(path)
+
+def formatChange(old, new, higherIsBetter=False):
+    if old == None or new == None: return "%10s" % "-"
+    if old == 0: return "%10.2f" % new
+    change = 100.0 * (new - old) / old
+    return "%10.2f %+6.1f%%%s" % (new, change, " !" if (change < -5 if higherIsBetter else change > 5) else "")
+
+def compare(oldPath, newPath):
+    old = harness.readResults(oldPath)
+    new = harness.readResults(newPath)
+    print("%-16s %18s %18s %18s" % ("scenario", "fps", "p95 frame ms", "peak rss kb"))
+    for name, result in new["scenarios"].items():
+        base = old["scenarios"].get(name, {})
+        if result.get("error") != None or base.get("error") != None:
+            print("%-16s failed" % name)
+            continue
+        print("%-16s %18s %18s %18s" % (name, formatChange(base.get("fps"), result["fps"], True),
+                                          formatChange((base.get("frame_ms") or {}).get("p95"), (result["frame_ms"] or {}).get("p95")),
+                                          formatChange(base.get("peak_rss_kb"), result["peak_rss_kb"])))
+
+def main():
+    parser = argparse.ArgumentParser(prog="python -m benchmarks", description="Headless Python OS benchmarks.")
+    parser.add_argument("scenarios", nargs="*", help="scenarios to run, all of them by default")
+    parser.add_argument("--size", default="%dx%d" % harness.SCREEN_SIZE, help="screen size, WIDTHxHEIGHT")
+    parser.add_argument("--output", help="results file, temp/benchmark-<time>.json by default")
+    parser.add_argument("--list", action="store_true", help="list the scenarios")
+    parser.add_argument("--compare", nargs=2, metavar=("OLD", "NEW"), help="compare two results files")
+    parser.add_argument("--replay", help="replay a recorded event log instead of the scripted scenarios")
+    parser.add_argument("--timeout", type=float, default=harness.SCENARIO_TIMEOUT, help="seconds each scenario may run, %d by default" % harness.SCENARIO_TIMEOUT)
+    parser.add_argument("--child", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    #Paths given on the command line are relative to where it was run, not to ROOT.
+    if args.replay != None: args.replay = os.path.join(CWD, args.replay)
+    if args.output != None: args.output = os.path.join(CWD, args.output)
+    if args.compare != None: args.compare = [os.path.join(CWD, path) for path in args.compare]
+    size = parseSize(args.size)
+    if args.list:
+        for name in SCENARIOS: print(name)
+        return 0
+    if args.compare:
+        compare(*args.compare)
+        return 0
+    if args.child:
+        scenario = EventLogReplay(args.replay) if args.replay != None else SCENARIOS[args.child]
+        harness.writeResults(harness.runScenario(scenario, size), args.output)
+        os._exit(0) #Worker threads of apps under test must not keep the process alive
+    for name in args.scenarios:
+        if name not in SCENARIOS:
+            parser.error("unknown scenario: " + name)
+    results = harness.getEnvironment(size)
+    results["scenarios"] = {}
+    failed = False
+    names = [EventLogReplay(args.replay).name] if args.replay != None else (args.scenarios or list(SCENARIOS.keys()))
+    for name in names:
+        result = runChild(name, size, args.replay, args.timeout)
+        results["scenarios"][name] = result
+        if result.get("error") != None:
+            failed = True
+            print("%-16s failed:\n%s" % (name, result["error"]))
+        else:
+            print("%-16s %8.1f fps  p50 %6.2f  p95 %6.2f  p99 %6.2f ms  peak rss %s kb" % (name, result["fps"], result["frame_ms"]["p50"],
+                                                                                  result["frame_ms"]["p95"], result["frame_ms"]["p99"], result["peak_rss_kb"]))
+            if result.get("load_seconds") != None:
+                print("%-16s %8.2f s to load" % ("", result["load_seconds"]))
+    output = args.output or os.path.join("temp", "benchmark-" + harness.datetime.now().strftime("%Y%m%d_%H%M%S") + ".json")
+    harness.writeResults(results, output)
+    print("Results written to " + output)
+    return 1 if failed else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,226 @@
+'''
+Headless benchmark harness for Python OS.
+
+Boots State under SDL's dummy video driver, feeds scripted input through
+GUI.EventQueue and measures how fast State.main gets through it.
+'''
+import os
+import sys
+import json
+import builtins
+import platform
+from time import perf_counter
+from traceback import format_exc
+from datetime import datetime
+from subprocess import check_output
+
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+os.environ.setdefault("SDL_AUDIODRIVER", "dummy")
+
+try:
+    from resource import getrusage, RUSAGE_SELF
+except ImportError:
+    getrusage = None
+
+import pygame
+import pyos
+
+SCREEN_SIZE = (800, 480)
+SETTLE_TIME = 1.0 #Seconds of frames run after the last scripted step
+PROFILER_WINDOW = 100000 #Keeps every frame of a scenario
+SCENARIO_TIMEOUT = 300 #Seconds a scenario process may run before it is stopped and reported as failed
+DATA_PATH = os.path.join("temp", "benchmark")
+
+class ScenarioFinished(Exception):
+    pass
+
+class ScenarioError(Exception):
+    pass
+
+class Script(object):
+    #Steps are timed in seconds from the start of the scenario and are run from the frame clock.
+    def __init__(self):
+        self.steps = []
+        self.conditions = []
+        self.duration = 0
+        self.next = 0
+
+    def at(self, time, method, *args):
+        self.steps.append((time, len(self.steps), method, args))
+        self.steps.sort()
+        self.duration = max(self.duration, time)
+
+    def call(self, method, *args):
+        self.at(self.duration, method, *args)
+
+    def wait(self, seconds):
+        self.duration += seconds
+
+    def waitUntil(self, condition):
+        #The scenario keeps running frames until condition() is true.
+        self.conditions.append(condition)
+
+    def post(self, eventType, **attributes):
+        self.call(pygame.event.post, pygame.event.Event(eventType, **attributes))
+
+    def tap(self, x, y, gap=0.1):
+        self.post(pygame.MOUSEBUTTONDOWN, pos=(x, y), button=1)
+        self.post(pygame.MOUSEBUTTONUP, pos=(x, y), button=1)
+        self.wait(gap)
+
+    def longClick(self, x, y, hold=0.5):
+        self.post(pygame.MOUSEBUTTONDOWN, pos=(x, y), button=1)
+        self.wait(hold)
+        self.post(pygame.MOUSEBUTTONUP, pos=(x, y), button=1)
+        self.wait(0.1)
+
+    def drag(self, start, end, duration=0.3, steps=10):
+        self.post(pygame.MOUSEBUTTONDOWN, pos=tuple(start), button=1)
+        for step in range(1, steps + 1):
+            self.wait(duration / steps)
+            pos = (int(start[0] + ((end[0] - start[0]) * step / float(steps))), int(start[1] + ((end[1] - start[1]) * step / float(steps))))
+            self.post(pygame.MOUSEMOTION, pos=pos, rel=(0, 0), buttons=(1, 0, 0))
+        self.post(pygame.MOUSEBUTTONUP, pos=tuple(end), button=1)
+        self.wait(0.1)
+
+    def getDue(self, elapsed):
+        due = []
+        while self.next < len(self.steps) and self.steps[self.next][0] <= elapsed:
+            due.append(self.steps[self.next])
+            self.next += 1
+        return due
+
+    def isFinished(self, elapsed):
+        if self.next < len(self.steps) or elapsed < self.duration + SETTLE_TIME: return False
+        return all(condition() for condition in self.conditions)
+
+class BenchmarkClock(object):
+    #Stands in for GUI.timer. State.main ticks it once per frame without limiting the frame rate.
+    def __init__(self, script):
+        self.script = script
+        self.start = None
+        self.frames = 0
+        self.elapsed = 0
+
+    def tick(self, framerate=0):
+        now = perf_counter()
+        if self.start == None: self.start = now
+        self.elapsed = now - self.start
+        if self.script.isFinished(self.elapsed): raise ScenarioFinished()
+        for time, order, method, args in self.script.getDue(self.elapsed):
+            method(*args)
+        self.frames += 1
+        return 0
+
+    def get_fps(self):
+        return self.frames / self.elapsed if self.elapsed > 0 else 0
+
+class Scenario(object):
+    name = "scenario"
+
+    def setup(self, state):
+        return
+
+    def build(self, state, script):
+        return
+
+    def teardown(self, state):
+        return
+
+    def getMetrics(self):
+        #Results of the scenario's own, added to its frame timings.
+        return {}
+
+def getDataPath(name):
+    path = os.path.join(DATA_PATH, name)
+    if not os.path.exists(path): os.makedirs(path)
+    return os.path.abspath(path).replace("\\", "/")
+
+def raiseError(message="Unknown", data=None):
+    #Replaces State.error_recovery, which waits for input on the error screen.
+    raise ScenarioError(message + " " + str(data) + "\n" + format_exc())
+
+def boot(size=SCREEN_SIZE):
+    pyos.settings = pyos.readJSON("res/settings.json", {})
+    pyos.settings["screen_size"] = {"width": size[0], "height": size[1]}
+    pyos.settings["idle_mode"] = False
+    pyos.State.error_recovery = staticmethod(raiseError)
+    state = pyos.State()
+    pyos.state = state
+    builtins.state = state
+    for app in state.getApplicationList().getApplicationList():
+        app.onOSLaunch()
+    state.getApplicationList().getApp("home").activate()
+    return state
+
+def runFrames(state, script):
+    clock = BenchmarkClock(script)
+    realTimer = state.getGUI().timer
+    state.getGUI().timer = clock
+    try:
+        pyos.State.main()
+    except ScenarioFinished:
+        pass
+    finally:
+        state.getGUI().timer = realTimer
+    return clock
+
+def getPeakRSS():
+    #Kilobytes; ru_maxrss is already in kilobytes on Linux, but in bytes on macOS.
+    if getrusage == None: return None
+    peak = getrusage(RUSAGE_SELF).ru_maxrss
+    return peak // 1024 if sys.platform == "darwin" else peak
+
+def runScenario(scenario, size=SCREEN_SIZE):
+    result = {"name": scenario.name, "error": None}
+    state = None
+    ready = False
+    try:
+        state = boot(size)
+        runFrames(state, Script()) #Let boot and the home app settle
+        scenario.setup(state)
+        ready = True
+        script = Script()
+        scenario.build(state, script)
+        state.setProfiler(pyos.Profiler(PROFILER_WINDOW))
+        clock = runFrames(state, script)
+        report = state.getProfiler().getReport()
+        result["frames"] = clock.frames
+        result["seconds"] = clock.elapsed
+        result["fps"] = clock.get_fps()
+        result["frame_ms"] = report.get("frame")
+        result["phases"] = report
+        result.update(scenario.getMetrics())
+    except:
+        result["error"] = format_exc()
+    finally:
+        if ready:
+            try:
+                scenario.teardown(state)
+            except:
+                if result["error"] == None: result["error"] = format_exc()
+        if state != None:
+            state.getExecutor().shutdown()
+    result["peak_rss_kb"] = getPeakRSS()
+    return result
+
+def getRevision():
+    try:
+        return check_output(["git", "rev-parse", "HEAD"], stderr=open(os.devnull, "w")).decode().strip()
+    except:
+        return None
+
+def getEnvironment(size=SCREEN_SIZE):
+    return {"time": str(datetime.now()), "revision": getRevision(), "python": platform.python_version(),
+            "pygame": pygame.version.ver, "platform": platform.platform(), "screen": list(size)}
+
+def writeResults(results, path):
+    f = open(path, "w")
+    json.dump(results, f, indent=2)
+    f.close()
+
+def readResults(path):
+    f = open(path)
+    results = json.load(f)
+    f.close()
+    return results
@@ -0,0 +1,203 @@
+'''
+Microbenchmarks for GUI primitives.
+
+    python -m benchmarks.micro                   Run everything
+    python -m benchmarks.micro render click      Only benchmarks whose names contain one of the words
+    python -m benchmarks.micro --compare old.json new.json
+
+Each benchmark is calibrated to run for at least --min-time seconds per sample, sampled --repeat
+times with the garbage collector off, and samples more than three scaled MADs from the median are
+rejected. Times are per operation, in microseconds.
+'''
+import os
+import sys
+import gc
+import argparse
+from math import sqrt
+from time import perf_counter
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+CWD = os.getcwd()
+os.chdir(ROOT)
+if ROOT not in sys.path: sys.path.insert(0, ROOT)
+
+from benchmarks import harness
+
+import pygame
+import pyos
+
+GUI = pyos.GUI
+
+def textCreate():
+    return lambda: GUI.Text((0, 0), "Python OS benchmark", (200, 200, 200), 14)
+
+def textCreateUncached():
+    #A new string every time, so the text cache never has the surface.
+    count = [0]
+    def run():
+        count[0] += 1
+        GUI.Text((0, 0), "Python OS " + str(count[0]), (200, 200, 200), 14)
+    return run
+
+def buttonCreate():
+    return lambda: GUI.Button((0, 0), "Benchmark", (200, 200, 200), (20, 20, 20), 14, width=100, height=40)
+
+def containerCreate():
+    return lambda: GUI.Container((0, 0), width=200, height=200, color=(20, 20, 20))
+
+def containerRender(children):
+    def setup():
+        container = GUI.Container((0, 0), width=800, height=440, color=(20, 20, 20))
+        for index in range(children):
+            container.addChild(GUI.Text(((index % 10) * 80, ((index // 10) % 22) * 20), "Item " + str(index % 100), (200, 200, 200), 14))
+        surface = pygame.Surface((800, 440))
+        def run():
+            container.markDirty()
+            container.render(surface)
+        return run
+    return setup
+
+def getClickedChild(depth):
+    def setup():
+        root = GUI.Container((0, 0), width=400, height=400, color=(20, 20, 20))
+        parent = root
+        for level in range(depth):
+            #Siblings so each level has something to skip
+            parent.addChild(GUI.Container((0, 0), width=10, height=10, color=(20, 20, 20)))
+            child = GUI.Container((10, 10), width=parent.computedWidth - 20, height=parent.computedHeight - 20, color=(20, 20, 20))
+            parent.addChild(child)
+            parent = child
+        event = pygame.event.Event(pygame.MOUSEBUTTONUP, pos=(200, 200), button=1)
+        return lambda: root.getClickedChild(event)
+    return setup
+
+def listAddChild(rows):
+    def setup():
+        texts = [GUI.Text((0, 0), "Row " + str(row), (200, 200, 200), 14) for row in range(rows)]
+        def run():
+            container = GUI.ListScrollableContainer((0, 0), width=400, height=400, margin=2)
+            for text in texts:
+                container.addChild(text)
+        return run
+    return setup
+
+def scrollableScroll(render):
+    def setup():
+        container = GUI.ScrollableContainer((0, 0), width=400, height=400, scrollAmount=40)
+        for row in range(200):
+            container.addChild(GUI.Text((0, row * 20), "Row " + str(row), (200, 200, 200), 14))
+        surface = pygame.Surface((400, 400))
+        direction = [-1]
+        def run():
+            #Scrolls to the end and back, so every call moves the content.
+            offset = container.offset
+            container.scroll(40 * direction[0])
+            if container.offset == offset:
+                direction[0] = -direction[0]
+                container.scroll(40 * direction[0])
+            if render: container.render(surface)
+        return run
+    return setup
+
+def renderTextrect(length):
+    def setup():
+        words = ("lorem ipsum dolor sit amet consectetur adipiscing elit " * (1 + (length // 56)))[:length]
+        font = state.getFont().get(14)
+        rect = pygame.Rect(0, 0, 400, 2000)
+        return lambda: GUI.MultiLineText.render_textrect(words, font, rect, (200, 200, 200), (20, 20, 20), 0, False)
+    return setup
+
+def getColor(item):
+    def setup():
+        palette = state.getColorPalette()
+        return lambda: palette.getColor(item)
+    return setup
+
+BENCHMARKS = [("Text.__init__", textCreate), ("Text.__init__[uncached]", textCreateUncached),
+              ("Button.__init__", buttonCreate), ("Container.__init__", containerCreate)]
+BENCHMARKS += [("Container.render[%d]" % count, containerRender(count)) for count in [10, 100, 1000]]
+BENCHMARKS += [("Container.getClickedChild[depth %d]" % depth, getClickedChild(depth)) for depth in range(1, 11)]
+BENCHMARKS += [("ListScrollableContainer.addChild[%d]" % rows, listAddChild(rows)) for rows in [10, 100, 1000]]
+BENCHMARKS += [("ScrollableContainer.scroll", scrollableScroll(False)), ("ScrollableContainer.scroll+render", scrollableScroll(True))]
+BENCHMARKS += [("MultiLineText.render_textrect[%d]" % length, renderTextrect(length)) for length in [100, 1000, 10000]]
+BENCHMARKS += [("ColorPalette.getColor[%s]" % item, getColor(item)) for item in ["item", "darker:background", "light:accent", "transparent:item:50%"]]
+
+def getLoops(method, minTime):
+    loops = 1
+    while True:
+        start = perf_counter()
+        for loop in range(loops):
+            method()
+        if perf_counter() - start >= minTime or loops >= 1 << 24: return loops
+        loops *= 2
+
+def rejectOutliers(samples):
+    ordered = sorted(samples)
+    median = ordered[len(ordered) // 2]
+    mad = sorted(abs(sample - median) for sample in samples)[len(samples) // 2] * 1.4826
+    if mad == 0: return samples
+    return [sample for sample in samples if abs(sample - median) <= 3 * mad]
+
+def measure(method, repeat=15, minTime=0.02):
+    loops = getLoops(method, minTime)
+    samples = []
+    gcEnabled = gc.isenabled()
+    gc.disable()
+    try:
+        for sample in range(repeat):
+            start = perf_counter()
+            for loop in range(loops):
+                method()
+            samples.append((perf_counter() - start) * 1000000.0 / loops)
+    finally:
+        if gcEnabled: gc.enable()
+    kept = rejectOutliers(samples)
+    mean = sum(kept) / len(kept)
+    return {"median_us": sorted(kept)[len(kept) // 2], "mean_us": mean, "stdev_us": sqrt(sum((sample - mean) ** 2 for sample in kept) / len(kept)),
+            "min_us": min(kept), "max_us": max(kept), "loops": loops, "samples": len(kept), "rejected": len(samples) - len(kept)}
+
+def compare(oldPath, newPath):
+    old = harness.readResults(oldPath)["benchmarks"]
+    new = harness.readResults(newPath)["benchmarks"]
+    print("%-44s %12s %12s %9s" % ("benchmark", "old us", "new us", "change"))
+    for name, result in new.items():
+        if name not in old:
+            print("%-44s %12s %12.3f" % (name, "-", result["median_us"]))
+            continue
+        change = 100.0 * (result["median_us"] - old[name]["median_us"]) / old[name]["median_us"]
+        print("%-44s %12.3f %12.3f %+8.1f%%%s" % (name, old[name]["median_us"], result["median_us"], change, " !" if change > 10 else ""))
+
+def main():
+    global state
+    parser = argparse.ArgumentParser(prog="python -m benchmarks.micro", description="Python OS GUI microbenchmarks.")
+    parser.add_argument("filters", nargs="*", help="only run benchmarks whose names contain one of these")
+    parser.add_argument("--repeat", type=int, default=15, help="samples per benchmark")
+    parser.add_argument("--min-time", type=float, default=0.02, help="minimum seconds per sample")
+    parser.add_argument("--output", help="results file, temp/micro-<time>.json by default")
+    parser.add_argument("--compare", nargs=2, metavar=("OLD", "NEW"), help="compare two results files")
+    args = parser.parse_args()
+    #Paths given on the command line are relative to where it was run, not to ROOT.
+    if args.output != None: args.output = os.path.join(CWD, args.output)
+    if args.compare != None: args.compare = [os.path.join(CWD, path) for path in args.compare]
+    if args.compare:
+        compare(*args.compare)
+        return 0
+    state = harness.boot()
+    results = harness.getEnvironment()
+    results["repeat"] = args.repeat
+    results["min_time"] = args.min_time
+    results["benchmarks"] = {}
+    for name, setup in BENCHMARKS:
+        if args.filters != [] and not any(word.lower() in name.lower() for word in args.filters): continue
+        result = measure(setup(), args.repeat, args.min_time)
+        results["benchmarks"][name] = result
+        print("%-44s %12.3f us  +-%6.1f%%  (%d loops, %d rejected)" % (name, result["median_us"], 100.0 * result["stdev_us"] / result["mean_us"] if result["mean_us"] else 0,
+                                                                  result["loops"], result["rejected"]))
+    output = args.output or os.path.join("temp", "micro-" + harness.datetime.now().strftime("%Y%m%d_%H%M%S") + ".json")
+    harness.writeResults(results, output)
+    print("Results written to " + output)
+    state.getExecutor().shutdown()
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,142 @@
+'''
+Times PMan's repository sync against a local stand-in for a package repository.
+
+    python -m benchmarks.pman_sync                    Serial and concurrent sync of 60 packages at 50 ms per request
+    python -m benchmarks.pman_sync --packages 200 --latency 0.1 --workers 1 4 8
+
+The fixture repository is written to temp/benchmark/pman-repo and served by http.server over HTTP/1.1, so
+connections are kept alive. Every request waits --latency seconds before it is answered. Besides the valid
+packages, the fixture lists one package without a manifest and one with a malformed manifest, and a second
+repository whose apps.json is malformed. A sync must skip all three, and still fetch the valid package whose
+name is not ASCII.
+'''
+import os
+import sys
+import json
+import argparse
+from shutil import copyfile
+from time import perf_counter, sleep
+from threading import Thread, Lock
+from functools import partial
+from http.server import ThreadingHTTPServer, SimpleHTTPRequestHandler
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path: sys.path.insert(0, ROOT)
+
+from benchmarks import harness
+from benchmarks.harness import getDataPath
+from apps.pman import Fetcher, syncRepositories
+
+KINDS = ["Clock", "Game", "Music Player", "Notes", "Weather", "Calculator"] #Gives pman-search something to find
+
+def buildFixture(path, packages):
+    repo = os.path.join(path, "repo")
+    names = ["package%04d" % package for package in range(packages)] + ["paquete-año"]
+    for name in names + ["malformed"]:
+        directory = os.path.join(repo, "apps", name)
+        if not os.path.exists(directory): os.makedirs(directory)
+    for package, name in enumerate(names):
+        kind = KINDS[package % len(KINDS)]
+        writeJSON(os.path.join(repo, "apps", name, "app.json"),
+                  {"name": name, "title": "%s %d" % (kind, package), "author": "author%d" % (package % 5), "version": 1.0,
+                   "description": "A " + kind.lower() + " from the fixture repository."})
+        copyfile(os.path.join("res", "icons", "unknown.png"), os.path.join(repo, "apps", name, "icon.png"))
+    writeJSON(os.path.join(repo, "apps", "malformed", "app.json"), ["not", "a", "manifest"])
+    writeJSON(os.path.join(repo, "apps.json"), {"apps_dir": "apps", "apps": names + ["missing", "malformed"], "featured": names[:2]})
+    broken = os.path.join(path, "broken")
+    if not os.path.exists(broken): os.makedirs(broken)
+    writeJSON(os.path.join(broken, "apps.json"), {"apps": "not a list"})
+    return names
+
+def writeJSON(path, data):
+    f = open(path, "w")
+    json.dump(data, f)
+    f.close()
+
+class FixtureHandler(SimpleHTTPRequestHandler):
+    protocol_version = "HTTP/1.1" #Keeps connections alive
+
+    def handle(self):
+        #Called once per connection.
+        self.server.count("connections")
+        SimpleHTTPRequestHandler.handle(self)
+
+    def do_GET(self):
+        self.server.count("requests")
+        sleep(self.server.latency)
+        SimpleHTTPRequestHandler.do_GET(self)
+
+    def log_message(self, format, *args):
+        return
+
+class FixtureServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, path, latency):
+        ThreadingHTTPServer.__init__(self, ("127.0.0.1", 0), partial(FixtureHandler, directory=path))
+        self.latency = latency
+        self.counters = {"connections": 0, "requests": 0}
+        self.lock = Lock()
+
+    def count(self, counter):
+        with self.lock:
+            self.counters[counter] += 1
+
+    def reset(self):
+        with self.lock:
+            self.counters = {"connections": 0, "requests": 0}
+
+    def getURL(self, path):
+        return "http://%s:%d/%s" % (self.server_address[0], self.server_address[1], path)
+
+def runSync(server, workers, names):
+    server.reset()
+    skipped = []
+    def report(text):
+        if text.startswith("!!!"): skipped.append(text)
+    fetcher = Fetcher(workers)
+    start = perf_counter()
+    try:
+        packages, featured = syncRepositories([server.getURL("repo"), server.getURL("broken")], fetcher, report)
+    finally:
+        fetcher.close()
+    seconds = perf_counter() - start
+    if sorted(packages.keys()) != names or len(skipped) != 3:
+        raise harness.ScenarioError("The sync did not match the fixture: %d of %d packages, skipped %s" % (len(packages), len(names), skipped))
+    result = {"workers": workers, "seconds": seconds, "packages": len(packages), "featured": featured, "skipped": skipped}
+    result.update(server.counters)
+    return result
+
+def main():
+    parser = argparse.ArgumentParser(prog="python -m benchmarks.pman_sync", description="PMan repository sync benchmark.")
+    parser.add_argument("--packages", type=int, default=60, help="packages in the fixture repository")
+    parser.add_argument("--latency", type=float, default=0.05, help="seconds each request waits before it is answered")
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 6], help="fetcher worker counts to run; 1 is a serial sync")
+    parser.add_argument("--output", help="results file, temp/pman-sync-<time>.json by default")
+    args = parser.parse_args()
+    #Paths given on the command line are relative to where it was run, not to ROOT.
+    if args.output != None: args.output = os.path.abspath(args.output)
+    os.chdir(ROOT)
+    path = getDataPath("pman-repo")
+    names = buildFixture(path, args.packages)
+    server = FixtureServer(path, args.latency)
+    Thread(target=server.serve_forever, daemon=True).start()
+    results = harness.getEnvironment()
+    results["packages"] = args.packages
+    results["latency"] = args.latency
+    results["runs"] = []
+    try:
+        for workers in args.workers:
+            result = runSync(server, workers, names)
+            results["runs"].append(result)
+            print("%3d workers %8.2f s  %5d requests  %4d connections" % (workers, result["seconds"], result["requests"], result["connections"]))
+    finally:
+        server.shutdown()
+        server.server_close()
+    output = args.output or os.path.join("temp", "pman-sync-" + harness.datetime.now().strftime("%Y%m%d_%H%M%S") + ".json")
+    harness.writeResults(results, output)
+    print("Results written to " + output)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,199 @@
+import os
+from time import perf_counter
+from threading import Thread
+from collections import OrderedDict
+
+import pygame
+import pyos
+
+from benchmarks.harness import Scenario, ScenarioError, getDataPath
+from benchmarks.pman_sync import FixtureServer, buildFixture, writeJSON
+
+class LauncherOpen(Scenario):
+    name = "launcher-open"
+
+    def build(self, state, script):
+        menu = (20, state.getGUI().height - 20)
+        for repeat in range(3):
+            script.tap(*menu) #Opens the launcher
+            script.wait(1.5)
+            script.tap(*menu) #Closes it again
+            script.wait(0.5)
+
+class FilesLargeDirectory(Scenario):
+    name = "files-10k"
+    entries = 10000
+
+    def setup(self, state):
+        self.path = getDataPath(self.name)
+        for entry in range(len(os.listdir(self.path)), self.entries):
+            open(os.path.join(self.path, "file%05d.txt" % entry), "w").close()
+
+    def build(self, state, script):
+        files = state.getApplicationList().getApp("files")
+        scrollX = state.getGUI().width - 10
+        bottom = state.getGUI().height - 40
+        script.call(files.activate)
+        script.wait(0.5)
+        script.call(self.openDirectory, files)
+        script.wait(0.5)
+        for tap in range(10):
+            script.tap(scrollX, bottom - 20) #Scroll down button
+        script.drag((scrollX, 90), (scrollX, bottom - 50), 1.0) #Scroll indicator, to the end and back
+        script.drag((scrollX, bottom - 50), (scrollX, 90), 1.0)
+
+    def openDirectory(self, files):
+        files.explorer.path = self.path
+        files.explorer.loadDir()
+
+class PmanSearch(Scenario):
+    #Searches a catalog synced from the pman_sync fixture repository. As in GalleryPaging, pman gets a scratch data
+    #store, and a scratch cache and repository list, so apps/pman/cache.json and res/pman.ds are left alone. Setting
+    #lastUpdate keeps pman from starting a sync of its own.
+    name = "pman-search"
+    packages = 200
+    queries = ["clock", "game", "music player"]
+
+    def setup(self, state):
+        self.path = getDataPath(self.name)
+        fixture = getDataPath("pman-repo")
+        self.names = buildFixture(fixture, self.packages)
+        self.server = FixtureServer(fixture, 0)
+        Thread(target=self.server.serve_forever, daemon=True).start()
+        self.pman = state.getApplicationList().getApp("pman")
+        self.module = self.pman.getModule()
+        self.userPaths = (self.module.REPOS_PATH, self.module.CACHE_PATH)
+        self.module.REPOS_PATH = os.path.join(self.path, "repos.json")
+        self.module.CACHE_PATH = os.path.join(self.path, "cache.json")
+        repos = [self.server.getURL("repo")]
+        writeJSON(self.module.REPOS_PATH, {"repos": repos})
+        fetcher = self.module.Fetcher()
+        try:
+            packages, featured = self.module.syncRepositories(repos, fetcher, lambda text: None)
+        finally:
+            fetcher.close()
+        packages["dsApp"] = self.pman.name
+        writeJSON(self.module.CACHE_PATH, packages)
+        self.userStore = self.pman.dataStore
+        self.pman.dataStore = pyos.DataStore(self.pman)
+        self.pman.dataStore.dsPath = os.path.join(self.path, "pman.ds")
+        self.pman.dataStore["lastUpdate"] = pyos.datetime.strftime(pyos.datetime.now(), "%a %b %d %H:%M:%S %Y")
+        self.pman.dataStore["featured"] = featured
+
+    def build(self, state, script):
+        pman = state.getApplicationList().getApp("pman")
+        script.call(pman.activate)
+        script.wait(1.0)
+        for query in self.queries:
+            script.call(self.search, pman, query)
+            script.wait(1.5)
+
+    def search(self, pman, query):
+        if len(self.module.catalog.getNames()) != len(self.names):
+            raise ScenarioError("The pman catalog does not hold the fixture packages")
+        self.module.SearchScreen.ondemand(query)
+
+    def teardown(self, state):
+        self.pman.dataStore = self.userStore
+        self.module.REPOS_PATH, self.module.CACHE_PATH = self.userPaths
+        self.server.shutdown()
+        self.server.server_close()
+        #pman keeps downloaded icons in temp/ until its next sync, which this run never makes.
+        for name in os.listdir("temp"):
+            if name.startswith("pman_"): os.remove(os.path.join("temp", name))
+
+class EditorLargeFile(Scenario):
+    #The editor loads the file a few lines per frame, so the taps and the drag land while it is still loading. The
+    #scenario runs until the load has finished, and reports how long it took as load_seconds. Expect a peak RSS of
+    #about 2 GB: the editor keeps every line of the file as its own text field, each with its own 780x20 pixel
+    #surface and rendered text, and a 1 MB file has about 19,000 lines.
+    name = "editor-1mb"
+    size = 1048576
+
+    def setup(self, state):
+        self.path = os.path.join(getDataPath(self.name), "large.txt")
+        self.loadStart = None
+        self.loadSeconds = None
+        if os.path.exists(self.path) and os.path.getsize(self.path) >= self.size: return
+        f = open(self.path, "w")
+        line = 0
+        written = 0
+        while written < self.size:
+            text = "Line %d: the quick brown fox jumps over the lazy dog.\n" % line
+            f.write(text)
+            written += len(text)
+            line += 1
+        f.close()
+
+    def build(self, state, script):
+        editor = state.getApplicationList().getApp("editor")
+        script.call(self.openFile, editor)
+        script.wait(2.0)
+        script.tap(100, 100)
+        script.tap(300, 200)
+        scrollX = state.getGUI().width - 10
+        script.drag((scrollX, 90), (scrollX, state.getGUI().height - 140), 1.0)
+        script.waitUntil(lambda: self.isLoaded(editor))
+
+    def openFile(self, editor):
+        self.loadStart = perf_counter()
+        editor.file = self.path
+        editor.activate()
+
+    def isLoaded(self, editor):
+        #The editor's module makes its Editor, and starts loading, once the app has started.
+        opened = getattr(editor.getModule(), "editor", None)
+        if self.loadSeconds == None and opened != None and not opened.isLoading():
+            self.loadSeconds = perf_counter() - self.loadStart
+        return self.loadSeconds != None
+
+    def getMetrics(self):
+        return {"load_seconds": self.loadSeconds}
+
+class GalleryPaging(Scenario):
+    name = "gallery-paging"
+    images = 24
+
+    def setup(self, state):
+        self.path = getDataPath(self.name)
+        for image in range(self.images):
+            path = os.path.join(self.path, "image%02d.png" % image)
+            if os.path.exists(path): continue
+            surface = pygame.Surface((640, 480))
+            surface.fill(((image * 40) % 256, (image * 70) % 256, (image * 110) % 256))
+            pygame.draw.circle(surface, (250, 250, 250), (320, 240), 40 + (image * 8))
+            pygame.image.save(surface, path)
+        #The gallery opens the folder it last showed. A scratch store points it at the test images, so the
+        #user's own res/gallery.ds is neither read nor written.
+        self.gallery = state.getApplicationList().getApp("gallery")
+        self.userStore = self.gallery.dataStore
+        self.gallery.dataStore = pyos.DataStore(self.gallery)
+        self.gallery.dataStore.dsPath = os.path.join(self.path, "gallery.ds")
+        self.gallery.dataStore["path"] = self.path
+
+    def build(self, state, script):
+        pageRight = (state.getGUI().width - 20, state.getGUI().height - 50)
+        pageLeft = (20, state.getGUI().height - 50)
+        script.call(self.gallery.activate)
+        script.wait(1.5)
+        for page in range(5):
+            script.tap(*pageRight)
+            script.wait(0.3)
+        for page in range(5):
+            script.tap(*pageLeft)
+            script.wait(0.3)
+
+    def teardown(self, state):
+        self.gallery.dataStore = self.userStore
+
+class EventLogReplay(Scenario):
+    #Plays back a recording from GUI.EventQueue.startRecording as fast as frames can be drawn, against a fixed clock.
+    def __init__(self, path):
+        self.path = path
+        self.name = "replay:" + os.path.basename(path)
+
+    def build(self, state, script):
+        script.call(state.getEventQueue().startReplay, self.path, 0)
+        script.waitUntil(lambda: state.getEventQueue().replay == None)
+
+SCENARIOS = OrderedDict((scenario.name, scenario) for scenario in [LauncherOpen(), FilesLargeDirectory(), PmanSearch(), EditorLargeFile(), GalleryPaging()])
@@ -13,15 +13,22 @@ except ImportError:
     pass
 import json
 import os
+import struct
 import builtins
 from importlib import import_module
 from shutil import rmtree
 from zipfile import ZipFile
-from _thread import start_new_thread
-from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor
+from threading import Lock, get_ident, enumerate as enumerateThreads
+from datetime import datetime, timedelta
 from builtins import staticmethod
-from traceback import format_exc
+from traceback import format_exc, format_exception
 from copy import deepcopy
+from weakref import WeakSet
+from collections import OrderedDict, deque
+from heapq import heappush, heappop
+from time import monotonic, perf_counter
+from math import ceil
 
 #state = None
 screen = None
@@ -35,7 +42,7 @@ settings = {}
 DEFAULT = 0xada
     
 def readFile(path):
-    f = open(path, "rU")
+    f = open(path, "r")
     lines = []
     for line in f.readlines():
         lines.append(line.rstrip())
@@ -44,14 +51,46 @@ def readFile(path):
 
 def readJSON(path, default={}):
     try:
-        f = open(path, "rU")    
+        f = open(path, "r")    
         jsd = json.loads(str(str(f.read())))        
         f.close()
         return jsd
     except:
         return default
     
+class Clock(object):
+    #Time as seen by apps, timed tasks and timers. Replays swap in a FixedClock so that runs are repeatable.
+    def now(self):
+        return datetime.now()
+    
+    def monotonic(self):
+        return monotonic()
+    
+class FixedClock(Clock):
+    #Only moves when advanced, from a fixed starting date.
+    def __init__(self, start=datetime(2016, 1, 1, 12, 0)):
+        self.start = start
+        self.elapsed = 0
+        
+    def advance(self, seconds):
+        self.elapsed += seconds
+        
+    def setElapsed(self, seconds):
+        self.elapsed = seconds
+        
+    def now(self):
+        return self.start + timedelta(seconds=self.elapsed)
+    
+    def monotonic(self):
+        return self.elapsed
+    
 class Thread(object):
+    #Scheduling classes: foreground threads run every frame, background threads at background_thread_hz,
+    #and idle threads only with whatever time is left in the frame after painting.
+    FOREGROUND = "foreground"
+    BACKGROUND = "background"
+    IDLE = "idle"
+    
     def __init__(self, method, **data):
         self.eventBindings = {}
         self.pause = False
@@ -59,6 +98,9 @@ class Thread(object):
         self.firstRun = True
         self.method = method
         self.pause = data.get("startPaused", False)
+        self.schedulingClass = data.get("schedulingClass", Thread.FOREGROUND)
+        self.name = data.get("name", getattr(method, "__name__", type(self).__name__))
+        self.lastRun = 0
         self.eventBindings["onStart"] = data.get("onStart", None)
         self.eventBindings["onStop"] = data.get("onStop", None)
         self.eventBindings["onPause"] = data.get("onPause", None)
@@ -89,6 +131,20 @@ class Thread(object):
         self.stop = True
         self.execEvent("onStop")
         
+    def setSchedulingClass(self, schedulingClass):
+        self.schedulingClass = schedulingClass
+        
+    def isDue(self, now):
+        if self.firstRun: return True
+        if self.pause or self.stop or self.schedulingClass == Thread.IDLE: return False
+        if self.schedulingClass == Thread.BACKGROUND:
+            return now - self.lastRun >= state.getThreadController().backgroundInterval
+        return True
+        
+    def getWaitTime(self):
+        #Seconds until this thread next needs to run, None if it only polls.
+        return None
+        
     def run(self):
         try:
             if self.firstRun:
@@ -114,6 +170,9 @@ class Task(Thread):
         
     def getReturn(self):
         return self.returnedData
+    
+    def getWaitTime(self):
+        return 0
         
     def setPause(self): return
     def execEvent(self, evtKey, *params): return
@@ -136,35 +195,129 @@ class TimedTask(Task):
         super(TimedTask, self).__init__(method, *additionalData)
         
     def run(self):
-        delta = self.executionTime - datetime.now()
+        delta = self.executionTime - state.getClock().now()
         if delta.total_seconds() <= 0:
             super(TimedTask, self).run()
             
+class CoroutineTask(Task):
+    #Resumes a generator on the main loop, a few steps per frame within the controller's budget.
+    def __init__(self, method, *additionalData):
+        super(CoroutineTask, self).__init__(method, *additionalData)
+        self.generator = None
+        
+    def run(self):
+        try:
+            if self.generator == None:
+                self.generator = self.method(*self.additionalData)
+            deadline = state.getThreadController().getFrameDeadline()
+            while True:
+                next(self.generator)
+                if monotonic() >= deadline: return
+        except StopIteration as done:
+            self.returnedData = done.value
+            self.setStop()
+        except:
+            State.error_recovery("Task error.", "Coroutine: "+str(self.method))
+            self.setStop()
+            
+    def setStop(self):
+        if self.generator != None and not self.stop:
+            self.generator.close()
+        super(CoroutineTask, self).setStop()
+            
 class ParallelTask(Task):
-    #Warning: This starts a new thread.
+    #Runs on the shared Executor's worker threads.
     def __init__(self, method, *additionalData):
         super(ParallelTask, self).__init__(method, *additionalData)
         self.ran = False
+        self.future = None
     
     def run(self):
         if not self.ran:
-            start_new_thread(self.runHelper, ())
+            self.future = state.getExecutor().submit(self.runHelper)
+            self.future.add_done_callback(self.finish)
             self.ran = True
+        elif self.future.cancelled():
+            self.setStop() #finish is not called for cancelled work
+            
+    def finish(self, future):
+        self.setStop()
+        future.report()
         
     def getReturn(self):
         return None
     
+    def getWaitTime(self):
+        return None if self.ran else 0
+    
     def runHelper(self):
-        self.method(*self.additionalData)
-        self.setStop()
+        start = perf_counter()
+        try:
+            self.method(*self.additionalData)
+        finally:
+            state.getTracer().span(self.name, "parallel", start)
+            self.setStop()
     
     def setStop(self):
         super(ParallelTask, self).setStop()
+        
+class ScheduledCall(object):
+    #Handle returned by Controller.callLater and callAt.
+    def __init__(self, deadline, method, *additionalData):
+        self.deadline = deadline
+        self.method = method
+        self.additionalData = additionalData
+        self.cancelled = False
+        self.called = False
+        
+    def cancel(self):
+        self.cancelled = True
+        
+    def getPending(self):
+        return not self.cancelled and not self.called
+    
+    def __lt__(self, other):
+        return self.deadline < other.deadline
+    
+    def run(self):
+        self.called = True
+        self.method(*self.additionalData)
                 
 class Controller(object):
     def __init__(self):
         self.threads = []
         self.dataRequests = {}
+        self.timers = [] #Heap of ScheduledCalls ordered by monotonic deadline
+        self.coroutineBudget = settings.get("coroutine_budget_ms", 4) / 1000.0
+        self.backgroundInterval = 1.0 / settings.get("background_thread_hz", 4)
+        self.frameStart = 0
+        self.frameDeadline = 0
+        
+    def getFrameDeadline(self):
+        #Shared by all CoroutineTasks in a frame; each still takes at least one step.
+        return self.frameDeadline
+        
+    def callLater(self, delay, method, *additionalData):
+        call = ScheduledCall(state.getClock().monotonic() + delay, method, *additionalData)
+        heappush(self.timers, call)
+        return call
+    
+    def callAt(self, when, method, *additionalData):
+        #when is a datetime, like TimedTask's executeOn.
+        return self.callLater((when - state.getClock().now()).total_seconds(), method, *additionalData)
+    
+    def rebaseTimers(self, shift):
+        #Keeps the remaining time of pending timers when the clock is replaced.
+        for call in self.timers:
+            call.deadline += shift
+    
+    def runTimedTask(self, task):
+        if task.stop: return
+        start = perf_counter()
+        Task.run(task)
+        state.getTracer().span(task.name, "thread", start)
+        if task in self.dataRequests:
+            self.dataRequests[task] = task.getReturn()
         
     def requestData(self, fromThread, default=None):
         self.dataRequests[fromThread] = default
@@ -173,11 +326,17 @@ class Controller(object):
         return self.dataRequests[fromThread]
     
     def addThread(self, thread):
+        if isinstance(thread, TimedTask):
+            #Timed tasks wait on the timer heap instead of being polled every frame.
+            thread.scheduledCall = self.callAt(thread.executionTime, self.runTimedTask, thread)
+            return
         self.threads.append(thread)
         
     def removeThread(self, thread):
         try:
-            if isinstance(thread, int):
+            if isinstance(thread, TimedTask):
+                thread.scheduledCall.cancel()
+            elif isinstance(thread, int):
                 self.threads.pop(thread)
             else:
                 self.threads.remove(thread)
@@ -187,24 +346,240 @@ class Controller(object):
     def stopAllThreads(self):
         for thread in self.threads:
             thread.setStop()
+        for call in self.timers:
+            call.cancel()
+            
+    def getWaitTime(self):
+        while self.timers != [] and not self.timers[0].getPending():
+            heappop(self.timers)
+        wait = None if self.timers == [] else max(self.timers[0].deadline - state.getClock().monotonic(), 0)
+        for thread in self.threads:
+            if thread.pause or thread.stop: continue
+            threadWait = thread.getWaitTime()
+            if threadWait != None and (wait == None or threadWait < wait):
+                wait = threadWait
+        return wait
         
     def run(self):
-        for thread in self.threads:
-            thread.run()
-            if thread in self.dataRequests:
+        self.frameStart = monotonic()
+        self.frameDeadline = self.frameStart + self.coroutineBudget
+        if self.timers != []:
+            now = state.getClock().monotonic()
+            while self.timers != [] and self.timers[0].deadline <= now:
+                call = heappop(self.timers)
+                if call.cancelled: continue
                 try:
-                    self.dataRequests[thread] = thread.getReturn()
+                    call.run()
                 except:
-                    self.dataRequests[thread] = False #getReturn called on Thread, not Task
+                    State.error_recovery("Timer error.", "Scheduled method: "+str(call.method))
+        for thread in self.threads:
+            if thread.isDue(self.frameStart):
+                self.runThread(thread)
             if thread.stop:
                 self.threads.remove(thread)
+                
+    def runIdle(self, frameLength):
+        #Called after painting; idle threads only run while the frame still has time to spare.
+        for thread in self.threads:
+            if monotonic() - self.frameStart >= frameLength: return
+            if thread.schedulingClass == Thread.IDLE and not thread.pause and not thread.stop:
+                self.runThread(thread)
+                
+    def runThread(self, thread):
+        thread.lastRun = self.frameStart
+        start = perf_counter()
+        thread.run()
+        state.getProfiler().record("thread:" + thread.name, start)
+        state.getTracer().span(thread.name, "thread", start)
+        if thread in self.dataRequests:
+            try:
+                self.dataRequests[thread] = thread.getReturn()
+            except:
+                self.dataRequests[thread] = False #getReturn called on Thread, not Task
+                
+class TaskFuture(object):
+    #Result of Executor.submit. Done callbacks are called on the main loop with the future.
+    def __init__(self, future, owner):
+        self.future = future
+        self.owner = owner
+        self.callbacks = []
+        self.delivered = False
+        self.abandoned = False
+        
+    def add_done_callback(self, method):
+        if self.delivered:
+            if not self.cancelled(): method(self)
+        else:
+            self.callbacks.append(method)
+        
+    def cancel(self):
+        #Work that has already started runs to completion, but its callbacks are dropped.
+        if self.future.cancel(): return True
+        if not self.future.done(): self.abandoned = True
+        return False
+        
+    def cancelled(self):
+        return self.future.cancelled() or self.abandoned
+    
+    def running(self):
+        return self.future.running()
+    
+    def done(self):
+        return self.future.done()
+    
+    def result(self, timeout=None):
+        return self.future.result(timeout)
+    
+    def exception(self, timeout=None):
+        return self.future.exception(timeout)
+    
+    def deliver(self):
+        #Callbacks of cancelled work are dropped, as it has no result for them to read.
+        self.delivered = True
+        if self.cancelled(): return
+        for method in self.callbacks:
+            try:
+                method(self)
+            except:
+                State.error_recovery("Task callback error.", "Callback: "+str(method))
+        if self.callbacks == []: self.report()
+        self.callbacks = []
+        
+    def report(self):
+        #For work whose result no callback looks at, so that its failures are not lost.
+        if not self.future.cancelled() and self.future.exception() != None:
+            error = self.future.exception()
+            print("Background task failed:\n" + "".join(format_exception(type(error), error, error.__traceback__)))
+        
+class Executor(object):
+    def __init__(self, workers=4):
+        self.pool = ThreadPoolExecutor(max_workers=workers)
+        self.futures = set()
+        self.completed = deque()
+        
+    def submit(self, method, *additionalData, **data):
+        #Work is owned by the active application unless an owner is given, and is cancelled when it closes.
+        future = TaskFuture(self.pool.submit(method, *additionalData), data.get("owner", state.getActiveApplication()))
+        self.futures.add(future)
+        future.future.add_done_callback(lambda f: self.complete(future))
+        return future
+    
+    def complete(self, future):
+        #Called on the worker thread, or on the main loop for cancelled work.
+        self.completed.append(future)
+        state.getGUI().wake()
+        
+    def cancelAll(self, owner=None):
+        for future in list(self.futures):
+            if owner == None or future.owner == owner:
+                future.cancel()
+                
+    def shutdown(self):
+        self.cancelAll()
+        self.pool.shutdown(wait=False)
+                
+    def run(self):
+        while len(self.completed) > 0:
+            future = self.completed.popleft()
+            self.futures.discard(future)
+            future.deliver()
+        
+class Profiler(object):
+    #Rolling frame phase timings in milliseconds, one sample per phase per frame for the last window frames.
+    def __init__(self, window=300):
+        self.window = window
+        self.phases = OrderedDict()
+        
+    def record(self, phase, start):
+        #Returns the end time, so consecutive phases can be chained.
+        now = perf_counter()
+        if phase not in self.phases:
+            self.phases[phase] = deque(maxlen=self.window)
+        self.phases[phase].append((now - start) * 1000.0)
+        return now
+    
+    @staticmethod
+    def getRank(ordered, q):
+        #Nearest rank: the smallest sample that at least q of the samples do not exceed.
+        return ordered[max(0, int(ceil(q * len(ordered))) - 1)]
+    
+    def getPercentiles(self, phase):
+        ordered = sorted(self.phases.get(phase, []))
+        if ordered == []: return None
+        return {"p50": Profiler.getRank(ordered, 0.5), "p95": Profiler.getRank(ordered, 0.95), "p99": Profiler.getRank(ordered, 0.99),
+                "max": ordered[-1], "samples": len(ordered)}
+        
+    def getReport(self):
+        return OrderedDict((phase, self.getPercentiles(phase)) for phase in list(self.phases))
+    
+    def reset(self):
+        self.phases.clear()
+    
+    def dump(self, path=None):
+        if path == None: path = "temp/profile_" + datetime.now().strftime("%Y%m%d_%H%M%S") + ".json"
+        report = {"time": str(datetime.now()), "window": self.window, "fps": state.getGUI().update_interval,
+                  "application": state.getActiveApplication().name if state.getActiveApplication() != None else None,
+                  "phases": self.getReport()}
+        f = open(path, "w")
+        json.dump(report, f, indent=2)
+        f.close()
+        return path
+        
+class Tracer(object):
+    #Chrome trace events (viewable in Perfetto) kept in a ring buffer, so recording can be left on.
+    def __init__(self, size=65536):
+        self.events = deque(maxlen=size)
+        self.recording = False
+        self.origin = perf_counter()
+        self.mainThread = get_ident()
+        
+    def start(self):
+        self.events.clear()
+        self.recording = True
+        
+    def stop(self, path=None):
+        self.recording = False
+        return self.dump(path)
+        
+    def span(self, name, category, start, args=None):
+        #Records a span from start, a perf_counter time, until now. Safe to call from any thread.
+        if not self.recording: return
+        self.events.append((name, category, start, perf_counter(), get_ident(), args))
+        
+    def dump(self, path=None):
+        if path == None: path = "temp/trace-" + datetime.now().strftime("%Y%m%d_%H%M%S") + ".json"
+        pid = os.getpid()
+        threadNames = dict((thread.ident, thread.name) for thread in enumerateThreads())
+        threadNames[self.mainThread] = "Main loop"
+        traceEvents = []
+        for name, category, start, end, tid, args in list(self.events):
+            event = {"name": name, "cat": category, "ph": "X", "pid": pid, "tid": tid,
+                     "ts": (start - self.origin) * 1000000.0, "dur": (end - start) * 1000000.0}
+            if args != None: event["args"] = args
+            traceEvents.append(event)
+        for tid in set(event["tid"] for event in traceEvents):
+            traceEvents.append({"name": "thread_name", "ph": "M", "pid": pid, "tid": tid, "args": {"name": threadNames.get(tid, str(tid))}})
+        f = open(path, "w")
+        json.dump({"traceEvents": traceEvents, "displayTimeUnit": "ms"}, f)
+        f.close()
+        return path
         
 class GUI(object):    
     def __init__(self):
         global screen
         self.orientation = 0 #0 for portrait, 1 for landscape
         self.timer = None
+        self.dirtyRects = []
+        self.fullRefresh = True
+        self.volatileComponents = WeakSet()
+        self.layoutQueue = WeakSet()
+        self.textCache = GUI.TextCache(settings.get("text_cache_bytes", 2097152))
+        self.hitIndexThreshold = settings.get("hit_index_threshold", 12) #Containers with fewer children are scanned linearly
         self.update_interval = settings.get("target_fps", 30)
+        self.idleMode = settings.get("idle_mode", True)
+        self.idlePollInterval = settings.get("idle_poll_interval", 1.0) #Longest sleep, so polling app threads still run
+        self.quietFrame = False
+        self.sleeping = False
         pygame.init()
         try:
             pygame.display.set_icon(pygame.image.load("res/icons/menu.png"))
@@ -239,18 +614,96 @@ class GUI(object):
         self.height = bk
         screen = pygame.display.set_mode((self.width, self.height))
         for app in state.getApplicationList().getApplicationList():
-            app.ui.refresh()
+            if app.hasUI(): app.ui.refresh()
+        self.requestFullRefresh()
         State.rescue()
             
     def repaint(self):
         screen.fill(state.getColorPalette().getColor("background"))
         
+    def addDirtyRect(self, rect):
+        self.dirtyRects.append(rect)
+        if self.sleeping: self.wake()
+        
+    def requestFullRefresh(self):
+        self.fullRefresh = True
+        
+    def addVolatile(self, component):
+        self.volatileComponents.add(component)
+        
+    def removeVolatile(self, component):
+        self.volatileComponents.discard(component)
+        
+    def pollVolatile(self):
+        for component in list(self.volatileComponents):
+            component.poll()
+            
+    def getWaitTime(self):
+        wait = None
+        for component in list(self.volatileComponents):
+            componentWait = component.getWaitTime()
+            if componentWait != None and (wait == None or componentWait < wait):
+                wait = componentWait
+        return wait
+    
+    def wake(self):
+        #Safe to call from other threads; ends an idle sleep early.
+        pygame.event.post(pygame.event.Event(pygame.USEREVENT, wake=True))
+        
+    def idle(self):
+        #Sleeps until input arrives or something is due, as long as the last frame had nothing to present.
+        if not self.idleMode or not self.quietFrame or self.dirtyRects != [] or self.fullRefresh: return
+        if state.getEventQueue().events != [] or state.getEventQueue().replay != None: return
+        wait = self.idlePollInterval
+        for due in [self.getWaitTime(), state.getThreadController().getWaitTime()]:
+            if due != None: wait = min(wait, due)
+        if wait <= 0: return
+        self.sleeping = True
+        if len(state.uiQueue) > 0 or len(state.getExecutor().completed) > 0:
+            self.sleeping = False
+            return
+        event = pygame.event.wait(max(int(wait * 1000), 1))
+        self.sleeping = False
+        if event.type != pygame.NOEVENT:
+            state.getEventQueue().handle(event)
+        
+    def requestLayout(self, component):
+        self.layoutQueue.add(component)
+        
+    def runLayout(self):
+        #Property changes made since the last frame are laid out once each, before painting.
+        while len(self.layoutQueue) > 0:
+            self.layoutQueue.pop().updateLayout()
+        
+    def getDirtyRegions(self, rects):
+        regions = []
+        bounds = screen.get_rect()
+        for rect in rects:
+            rect = rect.clip(bounds)
+            if rect.width == 0 or rect.height == 0: continue
+            overlapping = rect.collidelist(regions)
+            while overlapping != -1:
+                rect.union_ip(regions.pop(overlapping))
+                overlapping = rect.collidelist(regions)
+            regions.append(rect)
+        return regions
+        
     def refresh(self):
-        pygame.display.flip()
+        rects = self.dirtyRects
+        self.dirtyRects = []
+        self.quietFrame = rects == [] and not self.fullRefresh
+        if self.fullRefresh:
+            self.fullRefresh = False
+            pygame.display.flip()
+        elif rects != []:
+            pygame.display.update(self.getDirtyRegions(rects))
         
     def getScreen(self):
         return screen
     
+    def getTextCache(self):
+        return self.textCache
+    
     def monitorFPS(self):
         real = round(self.timer.get_fps())
         if real >= self.update_interval and self.update_interval < 30:
@@ -263,12 +716,13 @@ class GUI(object):
         pygame.draw.rect(screen, bgcolor, [0, ((state.getGUI().height - 40)/2) - size, state.getGUI().width, 2*size])
         screen.blit(state.getFont().get(size).render(text, 1, color), (5, ((state.getGUI().height - 40)/2) - size+(size/4)))
         pygame.display.flip()
+        self.requestFullRefresh()
     
     @staticmethod
     def getCenteredCoordinates(component, larger):
         return [(larger.computedWidth / 2) - (component.computedWidth / 2), (larger.computedHeight / 2) - (component.computedHeight / 2)]
         
-    class Font(object):        
+    class Font(object):
         def __init__(self, path="res/RobotoCondensed-Regular.ttf", minSize=10, maxSize=30):
             self.path = path
             curr_size = minSize
@@ -278,22 +732,72 @@ class GUI(object):
             while curr_size <= maxSize:
                 if self.ft_support:
                     try:
-                        self.ft_sizes[curr_size] = pygame.freetype.Font(path, curr_size)
+                        self.ft_sizes[curr_size] = self.load(curr_size, True)
                     except:
                         self.ft_support = False
-                self.sizes[curr_size] = pygame.font.Font(path, curr_size)
+                self.sizes[curr_size] = self.load(curr_size)
                 curr_size += 1
+                
+        def load(self, size, ft=False):
+            return pygame.freetype.Font(self.path, size) if ft else pygame.font.Font(self.path, size)
+        
+        def describe(self, size):
+            #Identifies a loaded font in caches without keeping it alive; fonts hold open files.
+            return (self.path, size)
             
         def get(self, size=14, ft=False):
             if ft and self.ft_support:
                 if size not in self.ft_sizes:
-                    self.ft_sizes[size] = pygame.freetype.Font(self.path, size)
+                    self.ft_sizes[size] = self.load(size, True)
                 return self.ft_sizes[size]
             else:
                 if size not in self.sizes:
-                    self.sizes[size] = pygame.font.Font(self.path, size)
+                    self.sizes[size] = self.load(size)
                 return self.sizes[size]
             
+    class TextCache(object):
+        def __init__(self, maxBytes=2097152):
+            self.maxBytes = maxBytes
+            self.bytes = 0
+            self.surfaces = OrderedDict()
+            self.hits = 0
+            self.misses = 0
+            self.evictions = 0
+            
+        @staticmethod
+        def getSurfaceBytes(surface):
+            if isinstance(surface, tuple): surface = surface[0] #Freetype renders return (surface, rect)
+            return surface.get_pitch() * surface.get_height()
+            
+        def render(self, font, text, color, ft=False, antialias=True, description=None):
+            #description is the font's GUI.Font.describe; without one, the cache is keyed by the font itself.
+            key = (description if description != None else (font, None)) + (ft, text, tuple(color), antialias)
+            if key in self.surfaces:
+                self.hits += 1
+                self.surfaces.move_to_end(key)
+                return self.surfaces[key]
+            self.misses += 1
+            if ft:
+                surface = font.render(text, color)
+            else:
+                surface = font.render(text, antialias, color)
+            size = GUI.TextCache.getSurfaceBytes(surface)
+            if size <= self.maxBytes:
+                self.surfaces[key] = surface
+                self.bytes += size
+                while self.bytes > self.maxBytes:
+                    self.bytes -= GUI.TextCache.getSurfaceBytes(self.surfaces.popitem(last=False)[1])
+                    self.evictions += 1
+            return surface
+        
+        def clear(self):
+            self.surfaces.clear()
+            self.bytes = 0
+            
+        def getStats(self):
+            return {"hits": self.hits, "misses": self.misses, "evictions": self.evictions,
+                    "entries": len(self.surfaces), "bytes": self.bytes, "maxBytes": self.maxBytes}
+            
     class Icons(object):
         def __init__(self):
             self.rootPath = "res/icons/"
@@ -342,7 +846,7 @@ class GUI(object):
         
         @staticmethod
         def loadFromFile(path):
-            f = open(path, "rU")
+            f = open(path, "r")
             icondata = json.load(f)
             toreturn = GUI.Icons()
             for key in list(dict(icondata).keys()):
@@ -408,7 +912,7 @@ class GUI(object):
         
         @staticmethod
         def loadFromFile(path):
-            f = open(path, "rU")
+            f = open(path, "r")
             colordata = json.load(f)
             toreturn = GUI.ColorPalette()
             for key in list(dict(colordata).keys()):
@@ -434,7 +938,7 @@ class GUI(object):
     class LongClickEvent(object):        
         def __init__(self, mouseDown):
             self.mouseDown = mouseDown
-            self.mouseDownTime = datetime.now()
+            self.mouseDownTime = state.getClock().now()
             self.mouseUp = None
             self.mouseUpTime = None
             self.intermediatePoints = []
@@ -446,7 +950,7 @@ class GUI(object):
             
         def end(self, mouseUp):
             self.mouseUp = mouseUp
-            self.mouseUpTime = datetime.now()
+            self.mouseUpTime = state.getClock().now()
             self.pos = self.mouseUp.pos
             
         def getLatestUpdate(self):
@@ -462,22 +966,133 @@ class GUI(object):
             self.pos = pos
             self.sourceEvent = src
         
+    class EventRecorder(object):
+        #Input events as fixed-size records of seconds since recording started, type, x, y and button (or held buttons, for motion).
+        MAGIC = b"PYOSEVT1"
+        RECORD = struct.Struct("<dBhhB")
+        TYPES = [pygame.MOUSEBUTTONDOWN, pygame.MOUSEBUTTONUP, pygame.MOUSEMOTION, pygame.QUIT]
+        
+        def __init__(self, path):
+            self.path = path
+            self.start = monotonic()
+            self.file = open(path, "wb")
+            self.file.write(GUI.EventRecorder.MAGIC)
+            
+        def record(self, event):
+            #Only the event types the EventQueue acts on are kept.
+            if event.type not in GUI.EventRecorder.TYPES: return
+            pos = getattr(event, "pos", (0, 0))
+            if event.type == pygame.MOUSEMOTION:
+                button = sum(1 << index for index, held in enumerate(event.buttons) if held)
+            else:
+                button = getattr(event, "button", 0)
+            self.file.write(GUI.EventRecorder.RECORD.pack(monotonic() - self.start, GUI.EventRecorder.TYPES.index(event.type), pos[0], pos[1], button))
+            
+        def close(self):
+            self.file.close()
+            
+    class EventReplay(object):
+        #Feeds a recording back in at speed times the original pace. At speed 0 every frame advances the recording
+        #by one frame at the target frame rate, so runs are repeatable however long frames take to draw.
+        def __init__(self, path, speed=1.0):
+            f = open(path, "rb")
+            data = f.read()
+            f.close()
+            if not data.startswith(GUI.EventRecorder.MAGIC):
+                raise ValueError("Not an event recording: " + path)
+            self.records = list(GUI.EventRecorder.RECORD.iter_unpack(data[len(GUI.EventRecorder.MAGIC):]))
+            self.speed = speed
+            self.frameLength = 1.0 / state.getGUI().update_interval
+            self.start = None
+            self.elapsed = 0
+            self.next = 0
+            
+        def getDue(self):
+            if self.start == None: self.start = monotonic()
+            if self.speed > 0:
+                self.elapsed = (monotonic() - self.start) * self.speed
+            else:
+                self.elapsed += self.frameLength
+            due = []
+            while self.next < len(self.records) and self.records[self.next][0] <= self.elapsed:
+                due.append(self.getEvent(self.records[self.next]))
+                self.next += 1
+            return due
+        
+        def getEvent(self, record):
+            time, eventType, x, y, button = record
+            eventType = GUI.EventRecorder.TYPES[eventType]
+            if eventType == pygame.MOUSEMOTION:
+                return pygame.event.Event(eventType, pos=(x, y), rel=(0, 0), buttons=tuple((button >> index) & 1 for index in range(3)))
+            if eventType == pygame.QUIT:
+                return pygame.event.Event(eventType)
+            return pygame.event.Event(eventType, pos=(x, y), button=button)
+        
+        def isFinished(self):
+            return self.next >= len(self.records)
+        
     class EventQueue(object):
         def __init__(self):
             self.events = []
+            self.recorder = None
+            self.replay = None
+            self.replayClock = None
+            self.previousClock = None
         
         def check(self):
+            if self.replay != None:
+                #Live input is ignored while a recording plays, apart from quitting.
+                for event in pygame.event.get(pygame.QUIT):
+                    self.handle(event)
+                for event in self.replay.getDue():
+                    self.handle(event)
+                if self.replayClock != None:
+                    self.replayClock.setElapsed(self.replay.elapsed)
+                if self.replay.isFinished():
+                    self.stopReplay()
+                return
             for event in pygame.event.get():
-                if event.type == pygame.QUIT:
-                    State.exit()
-                if event.type == pygame.MOUSEBUTTONDOWN:
-                    self.events.append(GUI.LongClickEvent(event))
-                if event.type == pygame.MOUSEMOTION and len(self.events) > 0 and isinstance(self.events[len(self.events)-1], GUI.LongClickEvent):
-                    self.events[len(self.events)-1].intermediateUpdate(event)
-                if event.type == pygame.MOUSEBUTTONUP and len(self.events) > 0 and isinstance(self.events[len(self.events)-1], GUI.LongClickEvent):
-                    self.events[len(self.events)-1].end(event)
-                    if not self.events[len(self.events)-1].checkValidLongClick():
-                        self.events[len(self.events)-1] = self.events[len(self.events)-1].mouseUp
+                self.handle(event)
+                
+        def startRecording(self, path=None):
+            if path == None: path = "temp/events-" + datetime.now().strftime("%Y%m%d_%H%M%S") + ".evlog"
+            self.stopRecording()
+            self.recorder = GUI.EventRecorder(path)
+            return path
+        
+        def stopRecording(self):
+            if self.recorder != None:
+                self.recorder.close()
+                self.recorder = None
+                
+        def startReplay(self, path, speed=1.0, fixedClock=True):
+            self.replay = GUI.EventReplay(path, speed)
+            if fixedClock:
+                if self.replayClock == None: self.previousClock = state.getClock()
+                self.replayClock = FixedClock()
+                state.setClock(self.replayClock)
+                
+        def stopReplay(self):
+            #The clock from before the replay is put back, so timers and the time of day run on afterwards.
+            self.replay = None
+            if self.replayClock != None:
+                state.setClock(self.previousClock)
+                self.previousClock = None
+            self.replayClock = None
+                
+        def handle(self, event):
+            if self.recorder != None:
+                self.recorder.record(event)
+            if event.type == pygame.QUIT:
+                State.exit()
+            if event.type == pygame.MOUSEBUTTONDOWN:
+                self.events.append(GUI.LongClickEvent(event))
+            if event.type == pygame.MOUSEMOTION and len(self.events) > 0 and isinstance(self.events[len(self.events)-1], GUI.LongClickEvent):
+                self.events[len(self.events)-1].intermediateUpdate(event)
+            if event.type == pygame.MOUSEBUTTONUP and len(self.events) > 0 and isinstance(self.events[len(self.events)-1], GUI.LongClickEvent):
+                self.events[len(self.events)-1].end(event)
+                if not self.events[len(self.events)-1].checkValidLongClick():
+                    self.events[len(self.events)-1] = self.events[len(self.events)-1].mouseUp
         
         def getLatest(self):
             if len(self.events) == 0: return None
@@ -504,9 +1119,59 @@ class GUI(object):
         def clear(self):
             self.events = []
         
-    class Component(object):                    
+    class Position(list):
+        def __init__(self, owner, items):
+            super(GUI.Position, self).__init__(items)
+            self.owner = owner
+            
+        def __setitem__(self, index, value):
+            if self[index] != value:
+                super(GUI.Position, self).__setitem__(index, value)
+                self.owner.markDirty()
+                self.owner.requestLayout()
+                
+        def __copy__(self):
+            return list(self)
+        
+        def __deepcopy__(self, memo):
+            return list(self)
+        
+    class HitIndex(object):
+        #Uniform grid over child rects, in the container's coordinates. Built lazily and dropped on layout changes.
+        def __init__(self, components, cellSize=40, maxCells=256):
+            self.cellSize = cellSize
+            self.components = components[:]
+            self.cells = {}
+            self.large = []
+            for index, component in enumerate(self.components):
+                rect = component.rect
+                if rect.width <= 0 or rect.height <= 0: continue
+                x1, y1 = rect.left // cellSize, rect.top // cellSize
+                x2, y2 = (rect.right - 1) // cellSize, (rect.bottom - 1) // cellSize
+                if (x2 - x1 + 1) * (y2 - y1 + 1) > maxCells:
+                    self.large.append(index)
+                    continue
+                for cx in range(x1, x2 + 1):
+                    for cy in range(y1, y2 + 1):
+                        self.cells.setdefault((cx, cy), []).append(index)
+                        
+        def query(self, x, y):
+            indices = self.cells.get((int(x) // self.cellSize, int(y) // self.cellSize), [])
+            if self.large != []:
+                indices = sorted(set(indices + self.large))
+            return [self.components[index] for index in reversed(indices)]
+        
+    class Component(object):
+        RENDER_ATTRIBUTES = frozenset(["position", "width", "height", "surface", "border", "borderColor", "transparent",
+                                       "backgroundColor", "color", "text", "checked", "on", "percent",
+                                       "blinkOn", "doBlink", "indicatorPxPosition"])
+        LAYOUT_ATTRIBUTES = frozenset(["position", "width", "height"])
+        
         def __init__(self, position, **data):
             self.position = list(deepcopy(position))
+            self.parent = None
+            self.dirty = True
+            self.SCREEN_ROOT = False
             self.eventBindings = {}
             self.eventData = {}
             self.data = data
@@ -538,17 +1203,37 @@ class GUI(object):
             self.innerOffset = [0, 0]
             self.internalClickOverrides = {}
             
+        def __setattr__(self, name, value):
+            if name == "position":
+                value = GUI.Position(self, value)
+            elif name == "rect" and self.__dict__.get("parent") != None:
+                self.parent.hitIndex = None
+            elif name == "childComponents":
+                self.__dict__["hitIndex"] = None
+            if name in self.RENDER_ATTRIBUTES and self.__dict__.get(name, value) != value:
+                object.__setattr__(self, name, value)
+                self.markDirty()
+                if name in self.LAYOUT_ATTRIBUTES: self.requestLayout()
+            else:
+                object.__setattr__(self, name, value)
+            
         def _percentToPix(self, value, scale):
             return int(int(value.rstrip("%")) * scale)
             
         def setDimensions(self):
-            old_surface = self.surface.copy() if self.surface != None else None
+            self.markDirty()
+            self.computeLayout()
+            self.allocateSurface()
+            self.markDirty()
+            
+        def computeLayout(self):
+            self.originals[0] = list(self.position)
+            self.originals[1] = self.width
+            self.originals[2] = self.height
             if self.data.get("fixedSize", False):
                 self.computedWidth = self.data.get("width")
                 self.computedHeight = self.data.get("height")
                 self.rect = pygame.Rect(self.computedPosition, (self.computedWidth, self.computedHeight))
-                self.surface = pygame.Surface((self.computedWidth, self.computedHeight), pygame.SRCALPHA)
-                if old_surface != None: self.surface.blit(old_surface, (0, 0))
                 return
             appc = state.getActiveApplication().ui
             #Compute Position
@@ -585,8 +1270,47 @@ class GUI(object):
                     
             #print "Computed to: " + str(self.computedPosition) + ", " + str(self.computedWidth) + "x" + str(self.computedHeight) + ", " + str(self.resizable)
             self.rect = pygame.Rect(self.computedPosition, (self.computedWidth, self.computedHeight))                    
+            
+        def allocateSurface(self):
+            #A surface this component allocated is kept as long as its size still fits; others may be shared, so they are copied.
+            if self.surface != None and self.surface is self.__dict__.get("ownSurface") and self.surface.get_size() == (self.computedWidth, self.computedHeight):
+                return
+            old_surface = self.surface
             self.surface = pygame.Surface((self.computedWidth, self.computedHeight), pygame.SRCALPHA)
             if old_surface != None: self.surface.blit(old_surface, (0, 0))
+            self.ownSurface = self.surface
+            
+        def requestLayout(self):
+            if "rect" in self.__dict__:
+                state.getGUI().requestLayout(self)
+                
+        def updateLayout(self):
+            if self.position != self.originals[0] or self.width != self.originals[1] or self.height != self.originals[2]:
+                self.setDimensions()
+            
+        def getScreenRect(self):
+            if self.parent == None:
+                return self.rect.copy() if self.SCREEN_ROOT else None
+            parentRect = self.parent.getScreenRect()
+            if parentRect == None: return None
+            return self.rect.move(parentRect.left + self.parent.childOffset[0], parentRect.top + self.parent.childOffset[1]).clip(parentRect)
+        
+        def getRenderPosition(self):
+            if self.parent == None or self.parent.renderOffset == [0, 0]:
+                return self.computedPosition
+            return [self.computedPosition[0] + self.parent.renderOffset[0], self.computedPosition[1] + self.parent.renderOffset[1]]
+        
+        def markDirty(self):
+            #Attributes may be assigned before the component has been laid out.
+            if "rect" not in self.__dict__: return
+            self.dirty = True
+            parent = self.parent
+            while parent != None:
+                parent.dirty = True
+                parent = parent.parent
+            rect = self.getScreenRect()
+            if rect != None:
+                state.getGUI().addDirtyRect(rect)
 
         def onClick(self):
             if "onClick" in self.internalClickOverrides:
@@ -628,22 +1352,19 @@ class GUI(object):
             self.eventData["onIntermediateUpdate"] = data
 
         def render(self, largerSurface):
-            recompute = False
-            if self.position != self.originals[0]:
-                self.originals[0] = list(deepcopy(self.position))
-                recompute = True
-            if self.width != self.originals[1]:
-                self.originals[1] = self.width
-                recompute = True
-            if self.height != self.originals[2]:
-                self.originals[2] = self.height
-                recompute = True
-            if recompute:
-                self.setDimensions()
+            self.updateLayout()
             if self.border > 0:
                 pygame.draw.rect(self.surface, self.borderColor, [0, 0, self.computedWidth, self.computedHeight], self.border)
             if not self.surface.get_locked():
-                largerSurface.blit(self.surface, self.computedPosition)
+                largerSurface.blit(self.surface, self.getRenderPosition())
+            self.dirty = False
+            
+        def poll(self):
+            pass
+            
+        def getWaitTime(self):
+            #Seconds until a volatile component next needs polling, None if it is waiting on input.
+            return 0
             
         def refresh(self):
             self.setDimensions()
@@ -691,34 +1412,54 @@ class GUI(object):
             self.transparent = False
             self.backgroundColor = (0, 0, 0)
             self.childComponents = []
+            self.childOffset = [0, 0] #Where children appear on screen relative to their layout
+            self.hitIndex = None
+            self.renderOffset = [0, 0] #Where children are drawn on the surface they render to
             self.SKIP_CHILD_CHECK = False
             self.transparent = data.get("transparent", False)
             self.backgroundColor = data.get("color", state.getColorPalette().getColor("background"))
-            if "children" in data: self.childComponents = data["children"]
+            if "children" in data: 
+                self.childComponents = data["children"]
+                for child in self.childComponents:
+                    child.parent = self
             
         def addChild(self, component):
+            component.parent = self
             if self.resizable and "resizeble" not in component.data:
                 component.resizable = True
                 component.refresh()
             self.childComponents.append(component)
+            self.hitIndex = None
+            component.markDirty()
             
         def addChildren(self, *children):
             for child in children:
                 self.addChild(child)
             
         def removeChild(self, component):
+            component.markDirty()
             self.childComponents.remove(component)
+            self.hitIndex = None
+            if component.parent == self:
+                component.parent = None
             
         def clearChildren(self):
-            for component in self.childComponents:
+            self.markDirty()
+            for component in self.childComponents[:]:
                 self.removeChild(component)
             self.childComponents = []
             
+        def getHitCandidates(self, x, y):
+            #Children that may contain the local point (x, y), topmost first.
+            if len(self.childComponents) < state.getGUI().hitIndexThreshold:
+                return self.childComponents[::-1]
+            if self.hitIndex == None:
+                self.hitIndex = GUI.HitIndex(self.childComponents)
+            return self.hitIndex.query(x, y)
+            
         def getClickedChild(self, mouseEvent, offsetX=0, offsetY=0):
-            currChild = len(self.childComponents)
-            while currChild > 0:
-                currChild -= 1
-                child = self.childComponents[currChild]
+            candidates = self.getHitCandidates(mouseEvent.pos[0] - offsetX - self.computedPosition[0], mouseEvent.pos[1] - offsetY - self.computedPosition[1])
+            for child in candidates:
                 if "SKIP_CHILD_CHECK" in child.__dict__:
                     if child.SKIP_CHILD_CHECK:
                         if child.checkClick(mouseEvent, offsetX + self.computedPosition[0], offsetY + self.computedPosition[1]):
@@ -744,12 +1485,13 @@ class GUI(object):
         
         def render(self, largerSurface):
             if self.surface.get_locked(): return
-            if not self.transparent:
-                self.surface.fill(self.backgroundColor)
-            else:
-                self.surface.fill((0, 0, 0, 0))
-            for child in self.childComponents:
-                child.render(self.surface)
+            if self.dirty:
+                if not self.transparent:
+                    self.surface.fill(self.backgroundColor)
+                else:
+                    self.surface.fill((0, 0, 0, 0))
+                for child in self.childComponents:
+                    child.render(self.surface)
             super(GUI.Container, self).render(largerSurface)
             
         def refresh(self, children=True):
@@ -777,24 +1519,32 @@ class GUI(object):
                 super(GUI.AppContainer, self).__init__((0, 0), width=screen.get_width(), height=screen.get_height()-40,
                                                        resizable=False, fixedSize=True)
             
+        def getScreenRect(self):
+            if self.application != state.getActiveApplication(): return None
+            return pygame.Rect(self.position, (self.computedWidth, self.computedHeight))
+            
         def setDialog(self, dialog):
             self.dialogs.insert(0, dialog)
             self.dialogComponentsFreezes.insert(0, self.childComponents[:])
             self.dialogScreenFreezes.insert(0, self.surface.copy())
             self.addChild(dialog.baseContainer)
+            state.getGUI().requestFullRefresh()
             
         def clearDialog(self):
             self.dialogs.pop(0)
             self.childComponents = self.dialogComponentsFreezes[0]
             self.dialogComponentsFreezes.pop(0)
             self.dialogScreenFreezes.pop(0)
+            self.markDirty()
             
         def render(self):
-            if self.dialogs == []:
-                super(GUI.AppContainer, self).render(self.surface)
-            else:
-                self.surface.blit(self.dialogScreenFreezes[0], (0, 0))
-                self.dialogs[0].baseContainer.render(self.surface)
+            if self.dirty:
+                if self.dialogs == []:
+                    super(GUI.AppContainer, self).render(self.surface)
+                else:
+                    self.surface.blit(self.dialogScreenFreezes[0], (0, 0))
+                    self.dialogs[0].baseContainer.render(self.surface)
+                    self.dirty = False
             screen.blit(self.surface, self.position)
             
         def refresh(self):
@@ -819,15 +1569,19 @@ class GUI(object):
             self.use_freetype = data.get("freetype", False)
             self.responsive_width = data.get("responsive_width", True)
             data["surface"] = self.getRenderedText()
+            if data.get("border", 0) == 0: self.ownSurface = data["surface"]
             super(GUI.Text, self).__init__(position, **data)
             
         def getRenderedText(self):
             if self.use_freetype:
-                return self.font.get(self.size, True).render(str(self.text), self.color)
-            return self.font.get(self.size).render(self.text, 1, self.color)
+                return state.getGUI().getTextCache().render(self.font.get(self.size, True), str(self.text), self.color, True,
+                                                            description=self.font.describe(self.size))
+            return state.getGUI().getTextCache().render(self.font.get(self.size), self.text, self.color, description=self.font.describe(self.size))
             
         def refresh(self):
-            self.surface = self.getRenderedText()        
+            #Rendered text is shared through the text cache, so it must not be drawn on directly.
+            self.surface = self.getRenderedText().copy() if self.border > 0 else self.getRenderedText()
+            self.ownSurface = self.surface
 
         def render(self, largerSurface):
             if self.text != self._originalText:
@@ -843,42 +1597,94 @@ class GUI(object):
                 self.height = self.surface.get_height()
             self.setDimensions()
             
+    class WordWrapper(object):
+        #Least recently used wrappers are dropped past maxWrappers, releasing their fonts and word widths.
+        wrappers = OrderedDict()
+        maxWrappers = 16
+        
+        def __init__(self, font, maxWords=20000):
+            self.font = font
+            self.maxWords = maxWords
+            self.wordWidths = {}
+            
+        @staticmethod
+        def get(font, description=None):
+            #Wrappers are shared by the font's GUI.Font.describe, or by the font itself without one.
+            key = (description, type(font)) if description != None else font
+            wrapper = GUI.WordWrapper.wrappers.get(key)
+            if wrapper == None:
+                wrapper = GUI.WordWrapper(font)
+                GUI.WordWrapper.wrappers[key] = wrapper
+                while len(GUI.WordWrapper.wrappers) > GUI.WordWrapper.maxWrappers:
+                    GUI.WordWrapper.wrappers.popitem(last=False)
+            else:
+                GUI.WordWrapper.wrappers.move_to_end(key)
+            return wrapper
+            
+        def measure(self, word):
+            width = self.wordWidths.get(word)
+            if width == None:
+                if len(self.wordWidths) >= self.maxWords:
+                    self.wordWidths.clear()
+                width = self.font.size(word)[0]
+                self.wordWidths[word] = width
+            return width
+        
+        def wrapParagraph(self, paragraph, width):
+            if self.font.size(paragraph)[0] <= width:
+                return [paragraph]
+            lines = []
+            line = []
+            lineWidth = 0
+            for word in paragraph.split(" "):
+                wordWidth = self.measure(word + " ")
+                fits = lineWidth + wordWidth < width
+                if abs(lineWidth + wordWidth - width) <= len(line) + 1:
+                    #Summed word widths can be off by a pixel per word, so measure the line itself near the edge.
+                    fits = self.font.size(" ".join(line + [word]) + " ")[0] < width
+                if fits:
+                    line.append(word)
+                    lineWidth += wordWidth
+                else:
+                    lines.append(" ".join(line) + " " if line != [] else "")
+                    line = [word]
+                    lineWidth = wordWidth
+            lines.append(" ".join(line) + " ")
+            return lines
+            
+        def wrap(self, text, width, cache=None):
+            #Wrapped paragraphs are kept in cache so that an edit only re-wraps the paragraphs it changed.
+            lines = []
+            wrapped = {}
+            for paragraph in text.splitlines():
+                key = (paragraph, width)
+                if key not in wrapped:
+                    wrapped[key] = cache[key] if cache != None and key in cache else self.wrapParagraph(paragraph, width)
+                lines.extend(wrapped[key])
+            if cache != None:
+                cache.clear()
+                cache.update(wrapped)
+            return lines
+        
     class MultiLineText(Component):
         @staticmethod
-        def render_textrect(string, font, rect, text_color, background_color, justification, use_ft):
-            final_lines = []
-            requested_lines = string.splitlines()
+        def render_textrect(string, font, rect, text_color, background_color, justification, use_ft, wrapCache=None, description=None):
+            final_lines = GUI.WordWrapper.get(font, description).wrap(string, rect.width, wrapCache)
+            surface, err = GUI.MultiLineText.render_lines(final_lines, font, rect, text_color, background_color, justification, use_ft, description)
+            return (surface, err, final_lines)
+        
+        @staticmethod
+        def render_lines(lines, font, rect, text_color, background_color, justification, use_ft, description=None):
             err = None
-            for requested_line in requested_lines:
-                if font.size(requested_line)[0] > rect.width:
-                    words = requested_line.split(' ')
-                    for word in words:
-                        if font.size(word)[0] >= rect.width:
-                            #print "The word " + word + " is too long to fit in the rect passed."
-                            err = 0
-                    accumulated_line = ""
-                    for word in words:
-                        test_line = accumulated_line + word + " "
-                        if font.size(test_line)[0] < rect.width:
-                            accumulated_line = test_line 
-                        else: 
-                            final_lines.append(accumulated_line) 
-                            accumulated_line = word + " " 
-                    final_lines.append(accumulated_line)
-                else: 
-                    final_lines.append(requested_line)         
             surface = pygame.Surface(rect.size, pygame.SRCALPHA) 
             surface.fill(background_color) 
             accumulated_height = 0 
-            for line in final_lines: 
-                if accumulated_height + font.size(line)[1] >= rect.height:
+            for line in lines: 
+                line_height = font.size(line)[1]
+                if accumulated_height + line_height >= rect.height:
                     err = 1
                 if line != "":
-                    tempsurface = None
-                    if use_ft:
-                        tempsurface = font.render(line, text_color)
-                    else:
-                        tempsurface = font.render(line, 1, text_color)
+                    tempsurface = state.getGUI().getTextCache().render(font, line, text_color, use_ft, description=description)
                     if justification == 0:
                         surface.blit(tempsurface, (0, accumulated_height))
                     elif justification == 1:
@@ -888,8 +1694,8 @@ class GUI(object):
                     else:
                         print("Invalid justification argument: " + str(justification))
                         err = 2
-                accumulated_height += font.size(line)[1]
-            return (surface, err, final_lines)
+                accumulated_height += line_height
+            return (surface, err)
         
         def __init__(self, position, text, color=DEFAULT, size=DEFAULT, justification=DEFAULT, **data):
             #Defaults are "item", and 0 (left).
@@ -900,6 +1706,7 @@ class GUI(object):
             self.size = size
             self.text = text if isinstance(text, str) or isinstance(text, str) else str(text)
             self.textSurface = None
+            self.wrapCache = {}
             self.font = data.get("font", state.getFont())
             self.use_freetype = data.get("freetype", False)
             super(GUI.MultiLineText, self).__init__(position, **data)
@@ -909,7 +1716,8 @@ class GUI(object):
                 
         def getRenderedText(self):
             return GUI.MultiLineText.render_textrect(self.text, self.font.get(self.size, self.use_freetype), pygame.Rect(0, 0, self.computedWidth, self.computedHeight),
-                                                     self.color, (0, 0, 0, 0), self.justification, self.use_freetype)[0]
+                                                     self.color, (0, 0, 0, 0), self.justification, self.use_freetype, self.wrapCache,
+                                                     self.font.describe(self.size))[0]
             
         def refresh(self):
             super(GUI.MultiLineText, self).refresh()
@@ -919,7 +1727,6 @@ class GUI(object):
             
         def setText(self, text):
             self.text = text if isinstance(text, str) or isinstance(text, str) else str(text)
-            self.setDimensions()
             self.refresh()
             
     class ExpandingMultiLineText(MultiLineText):
@@ -937,17 +1744,15 @@ class GUI(object):
             self.refresh()
             
         def getRenderedText(self):
-            fits = False
-            surf = None
-            while not fits:
-                d = GUI.MultiLineText.render_textrect(self.text, self.font.get(self.size), pygame.Rect(self.computedPosition[0], self.computedPosition[1], self.computedWidth, self.height),
-                                                      self.color, (0, 0, 0, 0), self.justification, self.use_freetype)
-                surf = d[0]
-                fits = d[1] != 1
-                self.textLines = d[2]
-                if not fits:
-                    self.height += self.lineHeight
-                    self.computedHeight = self.height
+            font = self.font.get(self.size)
+            self.textLines = GUI.WordWrapper.get(font, self.font.describe(self.size)).wrap(self.text, self.computedWidth, self.wrapCache)
+            textHeight = sum([font.size(line)[1] for line in self.textLines])
+            if textHeight >= self.height:
+                #Grow by whole lineHeight steps until the text fits.
+                self.height += ((textHeight - self.height) // self.lineHeight + 1) * self.lineHeight
+                self.computedHeight = self.height
+            surf = GUI.MultiLineText.render_lines(self.textLines, font, pygame.Rect(self.computedPosition[0], self.computedPosition[1], self.computedWidth, self.height),
+                                                  self.color, (0, 0, 0, 0), self.justification, self.use_freetype, self.font.describe(self.size))[0]
             self.setDimensions()
             #if self.linkedScroller != None:
             #    self.linkedScroller.refresh(False)
@@ -1123,6 +1928,15 @@ class GUI(object):
     class Canvas(Component):
         def __init__(self, position, **data):
             super(GUI.Canvas, self).__init__(position, **data)
+            state.getGUI().addVolatile(self)
+            
+        def getWaitTime(self):
+            #A canvas that is not on screen, such as one in a paused app, does not keep the GUI from idling.
+            return None if self.getScreenRect() == None else 0
+            
+        def poll(self):
+            #Apps draw on canvases directly, so their contents may change at any time.
+            if self.getScreenRect() != None: self.markDirty()
         
     class KeyboardButton(Container):
         def __init__(self, position, symbol, altSymbol, **data):
@@ -1141,6 +1955,7 @@ class GUI(object):
             self.internalClickOverrides["onLongClick"] = (self.registerBlink, (True,))
             
         def registerBlink(self, lp=False):
+            state.getGUI().addVolatile(self)
             self.blinkTime = state.getGUI().update_interval / 6
             self.primaryTextComponent.color = state.getColorPalette().getColor("background")
             self.secondaryTextComponent.color = state.getColorPalette().getColor("background")
@@ -1152,15 +1967,15 @@ class GUI(object):
                 return self
             return None
         
-        def render(self, largerSurface):
+        def poll(self):
             if self.blinkTime >= 0:
                 self.blinkTime -= 1
                 if self.blinkTime < 0:
+                    state.getGUI().removeVolatile(self)
                     self.primaryTextComponent.color = state.getColorPalette().getColor("item")
                     self.secondaryTextComponent.color = state.getColorPalette().getColor("item")
                     self.backgroundColor = state.getColorPalette().getColor("background")
                     self.refresh()
-            super(GUI.KeyboardButton, self).render(largerSurface)
         
     class TextEntryField(Container):
         def __init__(self, position, initialText="", **data):
@@ -1173,7 +1988,7 @@ class GUI(object):
                 self.blinkInterval = data["blink"]
             else:
                 self.blinkInterval = 500
-            self.doBlink = True
+            self.doBlink = False
             self.blinkOn = False
             self.lastBlink = datetime.now()
             self.indicatorPosition = len(initialText)
@@ -1208,10 +2023,12 @@ class GUI(object):
         def activate(self):
             self.clearScrollParams()
             self.updateOverflow()
+            if state.getKeyboard() != None and state.getKeyboard().textEntryField not in (None, self):
+                state.getKeyboard().textEntryField.setBlink(False)
             state.setKeyboard(GUI.Keyboard(self))
             if self.MULTILINE != None:
-                for f in self.MULTILINE.textFields: f.doBlink = False
-            self.doBlink = True
+                for f in self.MULTILINE.textFields: f.setBlink(False)
+            self.setBlink(True)
             mousePos = self.innerClickCoordinates[0] - self.innerOffset[0]
             if mousePos > self.textComponent.computedWidth:
                 self.indicatorPosition = len(self.textComponent.text)
@@ -1287,18 +2104,34 @@ class GUI(object):
             self.updateOverflow()
             super(GUI.TextEntryField, self).refresh()
                 
-        def render(self, largerSurface):
-            if not self.transparent:
-                self.surface.fill(self.backgroundColor)
+        def setBlink(self, blink):
+            #Only the field being typed into blinks its cursor, so only it is polled every frame.
+            self.doBlink = blink
+            if blink:
+                state.getGUI().addVolatile(self)
             else:
-                self.surface.fill((0, 0, 0, 0))
-            for child in self.childComponents:
-                child.render(self.surface)
+                self.blinkOn = False
+                state.getGUI().removeVolatile(self)
+                
+        def getWaitTime(self):
+            if not self.doBlink or self.getScreenRect() == None: return None
+            return max((self.blinkInterval / 1000.0) - (datetime.now() - self.lastBlink).total_seconds(), 0)
+                
+        def poll(self):
             if self.doBlink:
                 if ((datetime.now() - self.lastBlink).microseconds / 1000) >= self.blinkInterval:
                     self.lastBlink = datetime.now()
                     self.blinkOn = not self.blinkOn
-                if self.blinkOn:
+                
+        def render(self, largerSurface):
+            if self.dirty:
+                if not self.transparent:
+                    self.surface.fill(self.backgroundColor)
+                else:
+                    self.surface.fill((0, 0, 0, 0))
+                for child in self.childComponents:
+                    child.render(self.surface)
+                if self.doBlink and self.blinkOn:
                     pygame.draw.rect(self.surface, self.textComponent.color, [self.indicatorPxPosition, 2, 2, self.computedHeight-4])
             super(GUI.Container, self).render(largerSurface)
             
@@ -1493,6 +2326,7 @@ class GUI(object):
             self.pct = 1.0 * self.scrollContainer.computedHeight / (self.scrollContainer.maxOffset - self.scrollContainer.minOffset)
             self.slide = -self.scrollContainer.offset*self.pct
             self.sih = self.pct * self.computedHeight
+            self.markDirty()
             
         def render(self, largerSurface):
             self.surface.fill(self.color)
@@ -1528,6 +2362,8 @@ class GUI(object):
             self.offset = 0
             self.minOffset = 0
             self.maxOffset = self.container.computedHeight
+            self.contentStrip = None
+            self.stripTop = 0
             self.scrollIndicator.update()
             
         def scroll(self, amount):
@@ -1538,40 +2374,47 @@ class GUI(object):
                 if self.offset + amount > self.minOffset:
                     #self.offset = -self.minOffset
                     return
-            for child in self.container.childComponents:
-                child.position[1] = child.computedPosition[1]+amount
-            self.offset += amount
+            self.setOffset(self.offset + amount)
+            
+        def setOffset(self, offset):
+            #Children keep their layout positions; the offset is applied when the content is blitted.
+            self.offset = offset
+            self.container.childOffset[1] = offset
+            self.markDirty()
             self.scrollIndicator.update()
                 
         def getVisibleChildren(self):
             visible = []
             for child in self.container.childComponents:
-                if child.computedPosition[1]+child.computedHeight >= -10 and child.computedPosition[1]-child.computedHeight <= self.computedHeight + 10:
+                childY = child.computedPosition[1] + self.offset
+                if childY+child.computedHeight >= -10 and childY-child.computedHeight <= self.computedHeight + 10:
                     visible.append(child)
             return visible
         
+        def getChildrenBetween(self, top, bottom):
+            #Children that overlap the content from top to bottom.
+            return [child for child in self.container.childComponents
+                    if child.computedPosition[1] + child.computedHeight > top and child.computedPosition[1] < bottom]
+        
         def getClickedChild(self, mouseEvent, offsetX=0, offsetY=0):
             if not self.checkClick(mouseEvent, offsetX, offsetY):
                 return None
             clicked = self.scrollBar.getClickedChild(mouseEvent, offsetX + self.computedPosition[0], offsetY + self.computedPosition[1])
             if clicked != None: return clicked
-            visible = self.getVisibleChildren()
-            currChild = len(visible)
-            while currChild > 0:
-                currChild -= 1
-                child = visible[currChild]
+            candidates = self.container.getHitCandidates(mouseEvent.pos[0] - offsetX - self.computedPosition[0], mouseEvent.pos[1] - offsetY - self.computedPosition[1] - self.offset)
+            for child in candidates:
                 if "SKIP_CHILD_CHECK" in child.__dict__:
                     if child.SKIP_CHILD_CHECK:
-                        if child.checkClick(mouseEvent, offsetX + self.computedPosition[0], offsetY + self.computedPosition[1]):
+                        if child.checkClick(mouseEvent, offsetX + self.computedPosition[0], offsetY + self.computedPosition[1] + self.offset):
                             return child
                         else:
                             continue
                     else:
-                        subCheck = child.getClickedChild(mouseEvent, offsetX + self.computedPosition[0], offsetY + self.computedPosition[1])
+                        subCheck = child.getClickedChild(mouseEvent, offsetX + self.computedPosition[0], offsetY + self.computedPosition[1] + self.offset)
                         if subCheck == None: continue
                         return subCheck
                 else:
-                    if child.checkClick(mouseEvent, offsetX + self.computedPosition[0], offsetY + self.computedPosition[1]):
+                    if child.checkClick(mouseEvent, offsetX + self.computedPosition[0], offsetY + self.computedPosition[1] + self.offset):
                         return child
             if self.checkClick(mouseEvent, offsetX, offsetY):
                 return self
@@ -1581,7 +2424,7 @@ class GUI(object):
             if component.computedPosition[1] < self.minOffset: self.minOffset = component.computedPosition[1]
             if component.computedPosition[1]+component.computedHeight > self.maxOffset: self.maxOffset = component.computedPosition[1]+component.computedHeight
             self.container.addChild(component)
-            self.scrollIndicator.update()
+            self.requestBoundsUpdate()
             
         def removeChild(self, component):
             self.container.removeChild(component)
@@ -1593,16 +2436,58 @@ class GUI(object):
                 self.maxOffset = self.computedHeight
                 for comp in self.container.childComponents:
                     if comp.computedPosition[1]+comp.computedHeight > self.maxOffset: self.maxOffset = comp.computedPosition[1]+comp.computedHeight
-            self.scrollIndicator.update()
+            self.requestBoundsUpdate()
+            
+        def requestBoundsUpdate(self):
+            #The indicator is brought up to date in the layout pass, once for any number of added or removed children.
+            self.boundsChanged = True
+            self.requestLayout()
+            
+        def updateLayout(self):
+            super(GUI.ScrollableContainer, self).updateLayout()
+            if self.__dict__.get("boundsChanged", False):
+                self.boundsChanged = False
+                self.scrollIndicator.update()
                     
         def clearChildren(self):
             self.container.clearChildren()
             self.maxOffset = self.computedHeight
-            self.offset = 0
-            self.scrollIndicator.update()
+            self.setOffset(0)
+            
+        def renderContent(self):
+            #The content is cached in a strip around the viewport, so scrolling within it costs one blit.
+            viewHeight = self.container.computedHeight
+            top = -self.offset
+            stripHeight = min(2 * viewHeight, max(self.maxOffset - self.minOffset, viewHeight))
+            if self.contentStrip == None or self.contentStrip.get_size() != (self.container.computedWidth, stripHeight):
+                self.contentStrip = pygame.Surface((self.container.computedWidth, stripHeight), pygame.SRCALPHA)
+                self.container.dirty = True
+            if self.container.dirty or top < self.stripTop or top + viewHeight > self.stripTop + stripHeight:
+                self.stripTop = max(min(top - ((stripHeight - viewHeight) // 2), self.maxOffset - stripHeight), self.minOffset)
+                self.container.renderOffset[1] = -self.stripTop
+                if not self.container.transparent:
+                    self.contentStrip.fill(self.container.backgroundColor)
+                else:
+                    self.contentStrip.fill((0, 0, 0, 0))
+                #Children outside the strip stay dirty until it is drawn around them.
+                for child in self.getChildrenBetween(self.stripTop, self.stripTop + stripHeight):
+                    child.render(self.contentStrip)
+                self.container.dirty = False
+            self.surface.blit(self.contentStrip, self.container.computedPosition, [0, top - self.stripTop, self.container.computedWidth, viewHeight])
             
         def render(self, largerSurface):
-            super(GUI.ScrollableContainer, self).render(largerSurface)
+            if self.surface.get_locked(): return
+            if self.dirty:
+                if not self.transparent:
+                    self.surface.fill(self.backgroundColor)
+                else:
+                    self.surface.fill((0, 0, 0, 0))
+                for child in self.childComponents:
+                    if child == self.container:
+                        self.renderContent()
+                    else:
+                        child.render(self.surface)
+            super(GUI.Container, self).render(largerSurface)
             
         def refresh(self, children=True):
             #super(GUI.ScrollableContainer, self).refresh()
@@ -1632,6 +2517,23 @@ class GUI(object):
             component.setDimensions()
             super(GUI.ListScrollableContainer, self).addChild(component)
             
+        def getChildrenBetween(self, top, bottom):
+            #Children are stacked in order, so the first one below top is found by bisection.
+            children = self.container.childComponents
+            low = 0
+            high = len(children)
+            while low < high:
+                middle = (low + high) // 2
+                if children[middle].computedPosition[1] + children[middle].computedHeight > top:
+                    high = middle
+                else:
+                    low = middle + 1
+            between = []
+            for index in range(low, len(children)):
+                if children[index].computedPosition[1] >= bottom: break
+                between.append(children[index])
+            return between
+            
         def removeChild(self, component):
             super(GUI.ListScrollableContainer, self).removeChild(component)
             childrenCopy = self.container.childComponents[:]
@@ -1639,6 +2541,72 @@ class GUI(object):
             for child in childrenCopy:
                 self.addChild(child)
                 
+    class VirtualListScrollableContainer(ScrollableContainer):
+        def __init__(self, position, **data):
+            self.dataSource = data.get("dataSource", [])
+            self.rowFactory = data.get("rowFactory", None) #Called with (item, index, spareRow), spareRow may be None
+            self.rowHeight = data.get("rowHeight", 40)
+            self.overscan = data.get("overscan", 2)
+            self.rows = {}
+            self.spareRows = []
+            super(GUI.VirtualListScrollableContainer, self).__init__(position, **data)
+            self.refresh()
+            
+        def getContentHeight(self):
+            return len(self.dataSource) * self.rowHeight
+        
+        def updateBounds(self):
+            self.minOffset = 0
+            self.maxOffset = max(self.getContentHeight(), self.computedHeight)
+            self.setOffset(max(min(self.offset, 0), self.computedHeight - self.maxOffset))
+            
+        def getVisibleRange(self):
+            first = max(int(-self.offset // self.rowHeight) - self.overscan, 0)
+            last = min(int((-self.offset + self.computedHeight) // self.rowHeight) + 1 + self.overscan, len(self.dataSource))
+            return range(first, last)
+        
+        def recycleRow(self, index):
+            row = self.rows.pop(index)
+            self.container.removeChild(row)
+            self.spareRows.append(row)
+            
+        def layoutRows(self):
+            visible = self.getVisibleRange()
+            for index in list(self.rows.keys()):
+                if index not in visible:
+                    self.recycleRow(index)
+            for index in visible:
+                row = self.rows.get(index, None)
+                if row == None:
+                    row = self.rowFactory(self.dataSource[index], index, self.spareRows.pop() if self.spareRows != [] else None)
+                    if row in self.spareRows:
+                        self.spareRows.remove(row)
+                    self.rows[index] = row
+                    row.position[1] = index * self.rowHeight
+                    self.container.addChild(row)
+                    
+        def setDataSource(self, dataSource):
+            for index in list(self.rows.keys()):
+                self.recycleRow(index)
+            self.container.clearChildren()
+            self.dataSource = dataSource
+            self.offset = 0
+            self.refresh()
+            
+        def scroll(self, amount):
+            offset = max(min(self.offset + amount, 0), self.computedHeight - self.maxOffset)
+            if offset == self.offset: return
+            self.setOffset(offset)
+            self.layoutRows()
+            
+        def clearChildren(self):
+            self.setDataSource([])
+            
+        def refresh(self, children=True):
+            self.updateBounds()
+            self.layoutRows()
+            self.container.refresh(children)
+            
     class TextScrollableContainer(ScrollableContainer):
         def __init__(self, position, textComponent=DEFAULT, **data):
             #Defaults to creating a text component.
@@ -1681,18 +2649,28 @@ class GUI(object):
             super(GUI.MultiLineTextEntryField, self).refresh()
             self.clearChildren()
             for tf in self.textFields:
-                self.addChild(tf)
+                self.placeField(tf)
+                
+        def placeField(self, field):
+            #Fields are all lineHeight high, so the next one goes below the last without summing every height.
+            field.position[1] = len(self.container.childComponents) * (self.lineHeight + self.margin)
+            field.setDimensions()
+            GUI.ScrollableContainer.addChild(self, field)
             
         def setCurrent(self, field):
             self.currentField = self.textFields.index(field)
             
-        def addField(self, initial_text):
-            if len(self.textFields) == self.maxLines: 
-                return
+        def createField(self, initial_text):
             field = GUI.TextEntryField((0, 0), initial_text, width=self.container.computedWidth, height=self.lineHeight,
                                        backgroundColor=self.backgroundColor, textColor=self.textColor)
             field.border = 0
             field.MULTILINE = self
+            return field
+            
+        def addField(self, initial_text):
+            if len(self.textFields) == self.maxLines: 
+                return
+            field = self.createField(initial_text)
             self.currentField += 1
             self.textFields.insert(self.currentField, field)
             field.activate()
@@ -1749,50 +2727,68 @@ class GUI(object):
             self.refresh()
             
         def setText(self, text):
+            for step in self.loadText(text): pass
+            
+        def loadText(self, text):
+            #A generator that adds the fields for text one line per step, so that a long text can be loaded by a
+            #CoroutineTask while the field is already shown. Lines are wrapped by the typing font's WordWrapper up
+            #front, instead of field by field as they would be typed.
             self.clear()
             if text == "":
                 self.addField("")
-            else:
-                for line in text.replace("\r", "").split("\n"):
-                    self.addField("")
-                    line = line.rstrip()
-                    words = line.split(" ")
-                    oldN = self.currentField
-                    for word in words:
-                        self.textFields[self.currentField].appendChar(word)
-                        self.textFields[self.currentField].appendChar(" ")
-                    if oldN != self.currentField:
-                        for n in range(oldN, self.currentField): self.wrappedLines.append(n)
-                for field in self.textFields:
+                state.getKeyboard().deactivate()
+                return
+            font = state.getTypingFont()
+            wrapper = GUI.WordWrapper.get(font.get(16), font.describe(16))
+            width = self.container.computedWidth - 3 #A field overflows past its width less 4
+            for line in text.replace("\r", "").split("\n"):
+                if len(self.textFields) == self.maxLines: break #The rest of the text is dropped
+                wrapped = wrapper.wrapParagraph(line.rstrip(), width)
+                for index, part in enumerate(wrapped):
+                    if len(self.textFields) == self.maxLines: break
+                    if index < len(wrapped) - 1:
+                        self.wrappedLines.append(len(self.textFields))
+                    else:
+                        part = part.rstrip(" ")
+                    field = self.createField(part)
                     if field.overflow > 0:
-                        field.textComponent.setText(field.textComponent.text.rstrip(" "))
+                        field.textComponent.setText(part.rstrip(" "))
                         field.updateOverflow()
-            self.refresh()
-            state.getKeyboard().deactivate()
+                    self.textFields.append(field)
+                    self.placeField(field)
+                yield
+            if self.currentField == -1: #Unless a field was tapped while loading
+                self.currentField = len(self.textFields) - 1
    
     class FunctionBar(object):
         def __init__(self):
             self.container = GUI.Container((0, state.getGUI().height-40), background=state.getColorPalette().getColor("background"), width=state.getGUI().width, height=40)
+            self.container.SCREEN_ROOT = True
             self.launcherApp = state.getApplicationList().getApp("launcher")
             self.notificationMenu = GUI.NotificationMenu()
             self.recentAppSwitcher = GUI.RecentAppSwitcher()
+            self.performanceOverlay = GUI.PerformanceOverlay()
             self.menu_button = GUI.Image((0, 0), surface=state.getIcons().getLoadedIcon("menu"), onClick=self.activateLauncher, onLongClick=Application.fullCloseCurrent)
-            self.app_title_text = GUI.Text((42, 8), "Python OS 6", state.getColorPalette().getColor("item"), 20, onClick=self.toggleRecentAppSwitcher)
+            self.app_title_text = GUI.Text((42, 8), "Python OS 6", state.getColorPalette().getColor("item"), 20, onClick=self.toggleRecentAppSwitcher, onLongClick=self.togglePerformanceOverlay)
             self.clock_text = GUI.Text((state.getGUI().width-45, 8), self.formatTime(), state.getColorPalette().getColor("accent"), 20, onClick=self.toggleNotificationMenu, onLongClick=State.rescue) #Add Onclick Menu
+            self.clockColor = self.clock_text.color
             self.container.addChild(self.menu_button)
             self.container.addChild(self.app_title_text)
             self.container.addChild(self.clock_text)
     
         def formatTime(self):
-            time = str(datetime.now())
+            time = str(state.getClock().now())
             if time.startswith("0"): time = time[1:]
             return time[time.find(" ")+1:time.find(":", time.find(":")+1)]
         
         def render(self):
             if state.getNotificationQueue().new:
                 self.clock_text.color = (255, 59, 59)
-            self.clock_text.text = self.formatTime()
-            self.clock_text.refresh()
+            time = self.formatTime()
+            if time != self.clock_text.text or self.clock_text.color != self.clockColor:
+                self.clockColor = self.clock_text.color
+                self.clock_text.text = time
+                self.clock_text.refresh()
             self.container.render(screen)
             
         def activateLauncher(self):
@@ -1814,6 +2810,59 @@ class GUI(object):
                 return
             else:
                 self.recentAppSwitcher.display()
+                
+        def togglePerformanceOverlay(self):
+            if self.performanceOverlay.displayed:
+                self.performanceOverlay.hide()
+            else:
+                self.performanceOverlay.display()
+                
+    class PerformanceOverlay(object):
+        #Live frame phase percentiles drawn over the top of the screen, independent of the active app.
+        def __init__(self, rows=10):
+            self.displayed = False
+            self.lastUpdate = 0
+            self.rows = []
+            self.container = GUI.Container((state.getGUI().width-300, 0), color=(20, 20, 20), width=300, height=26+(14*rows), border=1, borderColor=(200, 200, 200))
+            self.container.SCREEN_ROOT = True
+            self.container.addChild(GUI.Text((4, 5), "%-15s%6s%6s%6s" % ("ms", "p50", "p95", "p99"), (200, 200, 200), 12, font=state.getTypingFont()))
+            self.container.addChild(GUI.Button((250, 1), "Dump", (60, 60, 60), (200, 200, 200), 12, width=49, height=20, onClick=self.dump))
+            for row in range(rows):
+                self.rows.append(GUI.Text((4, 22+(14*row)), " ", (200, 200, 200), 12, font=state.getTypingFont()))
+                self.container.addChild(self.rows[row])
+                
+        def update(self):
+            #Twice a second is plenty to read, and keeps the overlay's own text rendering out of the numbers.
+            if monotonic() - self.lastUpdate < 0.5: return
+            self.lastUpdate = monotonic()
+            report = state.getProfiler().getReport()
+            phases = sorted([phase for phase in report if phase != "frame"], key=lambda phase: report[phase]["p95"], reverse=True)
+            if "frame" in report: phases.insert(0, "frame")
+            for row in range(len(self.rows)):
+                if row < len(phases):
+                    stats = report[phases[row]]
+                    text = "%-15s%6.1f%6.1f%6.1f" % (phases[row][:15], stats["p50"], stats["p95"], stats["p99"])
+                else:
+                    text = " "
+                if text != self.rows[row].text:
+                    self.rows[row].setText(text)
+                    
+        def display(self):
+            self.displayed = True
+            self.lastUpdate = 0
+            self.container.markDirty()
+            
+        def hide(self):
+            self.displayed = False
+            state.getGUI().addDirtyRect(self.container.getScreenRect())
+            
+        def dump(self):
+            path = state.getProfiler().dump()
+            state.getNotificationQueue().push(Notification("Profile Saved", "Frame timings were written to "+path+"."))
+            
+        def render(self):
+            self.update()
+            self.container.render(screen)
             
     class Keyboard(object):
         def __init__(self, textEntryField=None):
@@ -1827,6 +2876,7 @@ class GUI(object):
                 self.movedUI = True
             self.baseContainer = None
             self.baseContainer = GUI.Container((0, 0), width=state.getGUI().width, height=state.getGUI().height/3)
+            self.baseContainer.SCREEN_ROOT = True
             self.baseContainer.setPosition((0, 2*(state.getGUI().height/3)))
             self.keyWidth = self.baseContainer.computedWidth / 10
             self.keyHeight = self.baseContainer.computedHeight / 4
@@ -1883,6 +2933,8 @@ class GUI(object):
             self.active = False
             if self.movedUI:
                 state.getActiveApplication().ui.position[1] = 0
+            if self.textEntryField != None:
+                self.textEntryField.setBlink(False)
             self.textEntryField = None
             
         def setTextEntryField(self, field):
@@ -1909,7 +2961,7 @@ class GUI(object):
                 mult = self.textEntryField.MULTILINE
                 self.deactivate()
                 if mult != None:
-                    mult.textFields[mult.currentField].doBlink = False
+                    mult.textFields[mult.currentField].setBlink(False)
                     mult.addField("")
                 return
             if char == self.bkspc_sym:
@@ -2209,7 +3261,8 @@ class GUI(object):
             
         def render(self, largerSurface):
             super(GUI.Selector, self).render(largerSurface)
-            pygame.draw.circle(largerSurface, state.getColorPalette().getColor("accent"), (self.computedPosition[0]+self.computedWidth-(self.computedHeight/2)-2, self.computedPosition[1]+(self.computedHeight/2)), (self.computedHeight/2)-5)
+            renderPosition = self.getRenderPosition()
+            pygame.draw.circle(largerSurface, state.getColorPalette().getColor("accent"), (renderPosition[0]+self.computedWidth-(self.computedHeight/2)-2, renderPosition[1]+(self.computedHeight/2)), (self.computedHeight/2)-5)
                                      
         def getClickedChild(self, mouseEvent, offsetX=0, offsetY=0):
             if self.checkClick(mouseEvent, offsetX, offsetY):
@@ -2228,6 +3281,7 @@ class ImmersionUI(object):
     def launch(self, resp):
         if resp == "Yes":
             self.method(*(self, screen))
+            state.getGUI().requestFullRefresh()
             if self.onExit != None:
                 self.onExit()
         
@@ -2235,13 +3289,111 @@ class ImmersionUI(object):
         self.onExit = onExit
         GUI.YNDialog("Fullscreen", "The application "+self.application.title+" is requesting total control of the UI. Launch?", self.launch).display()
         
+class ManifestIndex(object):
+    #The apps.json listings and every listed app.json, parsed and kept in one file. Entries are checked against the
+    #mtimes of the app's directory and manifest, so boot reads the index instead of one file per app. A file that
+    #could not be read gets no stamp, is not saved, and is read again by the next refresh.
+    FORMAT = 2
+    
+    def __init__(self, path="temp/app_index.json", listingsPath="apps/apps.json"):
+        self.path = path
+        self.listingsPath = listingsPath
+        self.listings = {}
+        self.manifests = {}
+        self.load()
+        
+    @staticmethod
+    def getStamp(*paths):
+        stamp = []
+        for path in paths:
+            try: stamp.append(os.stat(path).st_mtime)
+            except OSError: stamp.append(None)
+        return stamp
+    
+    @staticmethod
+    def getManifestPath(location):
+        return os.path.join(location, "app.json").replace("\\", "/")
+        
+    def load(self):
+        index = readJSON(self.path, {})
+        if index.get("format") != ManifestIndex.FORMAT: index = {}
+        self.listings = index.get("listings", {})
+        self.manifests = index.get("manifests", {})
+        self.refresh()
+        
+    def refresh(self):
+        #Re-reads only what changed on disk since it was indexed.
+        changed = False
+        stamp = ManifestIndex.getStamp(self.listingsPath)
+        if self.listings.get("stamp") != stamp:
+            listings = readJSON(self.listingsPath, None)
+            self.listings = {"stamp": stamp if listings != None else None, "apps": listings if listings != None else {}}
+            changed = True
+        for location in list(self.manifests.keys()):
+            if location not in self.listings["apps"]:
+                del self.manifests[location]
+                changed = True
+        for location in self.listings["apps"]:
+            entry = self.manifests.get(location)
+            if entry == None or entry.get("stamp") != ManifestIndex.getStamp(location, ManifestIndex.getManifestPath(location)):
+                self.readManifest(location)
+                changed = True
+        if changed: self.save()
+        return changed
+    
+    def readManifest(self, location):
+        #The stamp is taken first, so a manifest written while it is read is read again next time.
+        stamp = ManifestIndex.getStamp(location, ManifestIndex.getManifestPath(location))
+        data = readJSON(ManifestIndex.getManifestPath(location), None)
+        if data == None:
+            self.manifests[location] = {"stamp": None, "data": {}}
+        else:
+            self.manifests[location] = {"stamp": stamp, "data": data}
+        
+    def save(self):
+        try:
+            f = open(self.path + ".tmp", "w")
+            manifests = dict((location, entry) for location, entry in self.manifests.items() if entry["stamp"] != None)
+            json.dump({"format": ManifestIndex.FORMAT, "listings": self.listings, "manifests": manifests}, f)
+            f.close()
+            os.replace(self.path + ".tmp", self.path)
+        except:
+            print("The application index could not be saved to " + self.path)
+            
+    def saveListings(self):
+        listingsfile = open(self.listingsPath, "w")
+        json.dump(self.listings["apps"], listingsfile)
+        listingsfile.close()
+        self.listings["stamp"] = ManifestIndex.getStamp(self.listingsPath)
+        
+    def getListings(self):
+        return dict(self.listings["apps"])
+    
+    def getManifest(self, location):
+        if location not in self.manifests:
+            self.readManifest(location)
+            self.save()
+        return self.manifests[location]["data"]
+    
+    def setListing(self, location, name):
+        self.listings["apps"][location] = name
+        self.saveListings()
+        self.readManifest(location)
+        self.save()
+        
+    def removeListing(self, location):
+        del self.listings["apps"][location]
+        self.saveListings()
+        if location in self.manifests: del self.manifests[location]
+        self.save()
+        
 class Application(object):  
     @staticmethod
     def dummy(*args, **kwargs): pass
         
     @staticmethod
     def getListings():
-        return readJSON("apps/apps.json")
+        return state.getManifestIndex().getListings()
     
     @staticmethod
     def chainRefreshCurrent():
@@ -2255,6 +3407,7 @@ class Application(object):
         state.setActiveApplication(app)
         state.getFunctionBar().app_title_text.setText(state.getActiveApplication().title)
         state.getGUI().repaint()
+        state.getGUI().requestFullRefresh()
         state.getApplicationList().pushActiveApp(app)
         
     @staticmethod
@@ -2269,12 +3422,8 @@ class Application(object):
     
     @staticmethod
     def removeListing(location):
-        alist = Application.getListings()
-        try: del alist[location]
+        try: state.getManifestIndex().removeListing(location)
         except: print("The application listing for " + location + " could not be removed.")
-        listingsfile = open("apps/apps.json", "w")
-        json.dump(alist, listingsfile)
-        listingsfile.close()
         
     @staticmethod
     def install(packageloc):
@@ -2288,11 +3437,7 @@ class Application(object):
             print("Upgrading "+app_name)
         package.extractall(os.path.join("apps/", app_name))
         package.close()
-        alist = Application.getListings()
-        alist[os.path.join("apps/", app_name)] = app_name
-        listingsfile = open("apps/apps.json", "w")
-        json.dump(alist, listingsfile)
-        listingsfile.close()
+        state.getManifestIndex().setListing(os.path.join("apps/", app_name), app_name)
         return app_name
     
     @staticmethod
@@ -2304,32 +3449,49 @@ class Application(object):
     def registerDebugApp(path):
         app_info = readJSON(os.path.join(path, "app.json"))
         app_name = str(app_info.get("name"))
-        alist = Application.getListings()
-        alist[os.path.join("apps/", app_name)] = app_name
-        listingsfile = open("apps/apps.json", "w")
-        json.dump(alist, listingsfile)
-        listingsfile.close()
+        state.getManifestIndex().setListing(os.path.join("apps/", app_name), app_name)
         state.getApplicationList().reloadList()
         GUI.OKDialog("Registered", "The application from "+path+" has been registered on the system.").display()
     
     def __init__(self, location):
+        #Only the manifest is read here; the module, thread and UI are loaded on first use.
         self.parameters = {}
         self.location = location
-        app_data = readJSON(os.path.join(location, "app.json").replace("\\", "/"))
+        app_data = state.getManifestIndex().getManifest(location)
         self.name = str(app_data.get("name"))
         self.title = str(app_data.get("title", self.name))
         self.version = float(app_data.get("version", 0.0))
         self.author = str(app_data.get("author", "No Author"))
-        self.module = import_module("apps." + str(app_data.get("module", self.name))) 
-        self.module.state = state
+        self.moduleName = "apps." + str(app_data.get("module", self.name))
+        self.mainName = str(app_data.get("main"))
         self.file = None
-        try:
-            self.mainMethod = getattr(self.module, str(app_data.get("main"))) 
-        except:
-            self.mainMethod = Application.dummy
+        self.loaded = False
         try: self.parameters = app_data.get("more")
         except: pass
         self.description = app_data.get("description", "No Description.")
+        if self.parameters.get("dataStore") == "log":
+            self.dataStore = LogDataStore(self)
+        else:
+            self.dataStore = DataStore(self)
+        
+    def __getattr__(self, name):
+        #Only reached for attributes that are not set yet.
+        if name == "ui":
+            self.ui = GUI.AppContainer(self)
+            return self.ui
+        if name in ("module", "mainMethod", "immersionUI", "evtHandlers", "thread"):
+            self.load()
+            return self.__dict__[name]
+        raise AttributeError(name)
+        
+    def load(self):
+        if self.loaded: return
+        self.module = import_module(self.moduleName)
+        self.module.state = state
+        try:
+            self.mainMethod = getattr(self.module, self.mainName)
+        except:
+            self.mainMethod = Application.dummy
         #Immersion check
         if "immersive" in self.parameters:
             self.immersionUI = ImmersionUI(self)
@@ -2345,10 +3507,20 @@ class Application(object):
         if "onResume" in self.parameters: self.evtHandlers["onResume"] = getattr(self.module, self.parameters["onResume"])
         if "onCustom" in self.parameters: self.evtHandlers["onCustom"] = getattr(self.module, self.parameters["onCustom"])
         if "onOSLaunch" in self.parameters: self.evtHandlers["onOSLaunch"] = getattr(self.module, self.parameters["onOSLaunch"])
-        self.thread = Thread(self.mainMethod, **self.evtHandlers)
-        self.ui = GUI.AppContainer(self)
-        self.dataStore = DataStore(self)
-        self.thread = Thread(self.mainMethod, **self.evtHandlers)
+        self.thread = Thread(self.mainMethod, name=self.name, **self.evtHandlers)
+        self.loaded = True
+        
+    def isLoaded(self):
+        return self.loaded
+    
+    def hasUI(self):
+        #Whether the AppContainer has been built; reading ui builds it.
+        return "ui" in self.__dict__
+        
+    def onOSLaunch(self):
+        #Only apps that declare an onOSLaunch hook are loaded at boot.
+        if "onOSLaunch" in self.parameters:
+            self.evtHandlers.get("onOSLaunch")()
         
     def getModule(self):
         return self.module
@@ -2379,11 +3551,13 @@ class Application(object):
             Application.setActiveApp(self)
             self.loadColorScheme()
             if self.thread in state.getThreadController().threads:
-                self.thread.setPause(False)
+                if self.thread.pause: self.thread.setPause(False)
             else:
                 if self.thread.stop:
-                    self.thread = Thread(self.mainMethod, **self.evtHandlers)
+                    self.thread = Thread(self.mainMethod, name=self.name, **self.evtHandlers)
                 state.getThreadController().addThread(self.thread)
+            #Set on the thread that will run, which a fully closed app has just replaced.
+            self.thread.setSchedulingClass(self.parameters.get("scheduling", Thread.FOREGROUND))
         except:
             State.error_recovery("Application init error.", "App name: "+self.name)
             
@@ -2396,14 +3570,20 @@ class Application(object):
             return state.getIcons().getLoadedIcon("unknown")
         
     def deactivate(self, pause=True):
+        self.dataStore.flush()
         if "persist" in self.parameters:
             if self.parameters["persist"] == False:
                 pause = False
         if pause:
-            self.thread.setPause(True)
+            #Apps may keep running at a lower class while they are not in front.
+            if "inactiveScheduling" in self.parameters:
+                self.thread.setSchedulingClass(self.parameters["inactiveScheduling"])
+            else:
+                self.thread.setPause(True)
         else:
             self.ui.clearChildren()
             self.thread.setStop()
+            state.getExecutor().cancelAll(self)
             state.getApplicationList().closeApp(self)
         state.getColorPalette().setScheme()
         
@@ -2459,6 +3639,7 @@ class ApplicationList(object):
             return self.activeApplications[1]
         
     def reloadList(self):
+        state.getManifestIndex().refresh()
         applist = Application.getListings()
         for key in list(dict(applist).keys()):
             try:
@@ -2538,30 +3719,90 @@ class NotificationQueue(object):
         self.notifications = []
         
 class DataStore(object):
+    #Each store is read from disk once and served from memory. Writes mark it dirty; it is written out, to a temporary
+    #file that replaces the old one, datastore_flush_delay seconds after the first write, when its app is deactivated
+    #and on State.exit.
+    stores = WeakSet()
+    
+    @staticmethod
+    def getCounters():
+        counters = {"reads": 0, "loads": 0, "writes": 0, "flushes": 0}
+        for store in list(DataStore.stores):
+            for counter in counters:
+                counters[counter] += getattr(store, counter)
+        return counters
+    
+    @staticmethod
+    def flushAll():
+        for store in list(DataStore.stores):
+            store.flush()
+    
     def __init__(self, app):
         self.application = app
         self.dsPath = os.path.join("res/", app.name+".ds")
+        self.data = None
+        self.dirty = False
+        self.reads = 0
+        self.loads = 0
+        self.writes = 0
+        self.flushes = 0
+        DataStore.stores.add(self)
         
     def getStore(self):
-        if not os.path.exists(self.dsPath):
-            wf = open(self.dsPath, "w")
-            json.dump({"dsApp": self.application.name}, wf)
-            wf.close()
-        rf = open(self.dsPath, "rU")
-        self.data = json.loads((rf.read()))
-        rf.close()
+        if self.data != None: return self.data
+        start = perf_counter()
+        if os.path.exists(self.dsPath):
+            rf = open(self.dsPath, "r")
+            self.data = json.loads((rf.read()))
+            rf.close()
+        else:
+            self.data = {"dsApp": self.application.name}
+        self.loads += 1
+        state.getTracer().span("DataStore.read", "datastore", start, {"app": self.application.name})
         return self.data
     
     def saveStore(self):
-        wf = open(self.dsPath, "w")
-        json.dump(self.data, wf)
-        wf.close()
+        self.writes += 1
+        if self.dirty: return
+        self.dirty = True
+        #Timers belong to the main loop, and writes may come from any thread.
+        state.postToUI(state.getThreadController().callLater, settings.get("datastore_flush_delay", 2.0), self.flush)
+        
+    def flush(self):
+        if not self.dirty: return
+        start = perf_counter()
+        writes = self.writes
+        try:
+            text = json.dumps(dict(self.data))
+            wf = open(self.dsPath + ".tmp", "w")
+            try:
+                wf.write(text)
+            finally:
+                wf.close()
+            os.replace(self.dsPath + ".tmp", self.dsPath)
+        except Exception as error:
+            self.retryFlush(error)
+            return
+        self.dirty = False
+        if self.writes != writes: #Written to while this flush ran, so it may have missed the change
+            self.retryFlush()
+        self.flushes += 1
+        state.getTracer().span("DataStore.write", "datastore", start, {"app": self.application.name})
     
+    def retryFlush(self, error=None):
+        #A full or read-only disk, or data that cannot be written as JSON, must not take down the frame that happened
+        #to flush; the store stays dirty and is flushed again later.
+        self.dirty = True
+        if error != None:
+            print("The data of " + self.application.name + " could not be saved to " + self.dsPath + ": " + str(error))
+        state.getThreadController().callLater(settings.get("datastore_flush_delay", 2.0), self.flush)
+        
     def get(self, key, default=None):
+        self.reads += 1
         return self.getStore().get(key, default)
     
     def set(self, key, value):
-        self.data[key] = value
+        self.getStore()[key] = value
         self.saveStore()
         
     def __getitem__(self, itm):
@@ -2570,8 +3811,161 @@ class DataStore(object):
     def __setitem__(self, key, val):
         self.set(key, val)
                 
+class LogDataStore(DataStore):
+    #Chosen with "dataStore": "log" in app.json. Each flushed write is appended to res/<app>.dslog as one
+    #"key<tab>value" JSON line, and only the offset of each key's latest record is kept in memory; values are read
+    #from the log when they are asked for. Once datastore_compact_ratio of the records are overwritten ones, the log
+    #is rewritten on a worker thread.
+    def __init__(self, app):
+        super(LogDataStore, self).__init__(app)
+        self.dsPath = os.path.join("res/", app.name+".dslog")
+        self.index = None
+        self.pending = OrderedDict()
+        self.records = 0
+        self.compacting = False
+        self.compactions = 0
+        self.lock = Lock()
+        
+    @staticmethod
+    def encodeRecord(key, value):
+        return (json.dumps(key) + "\t" + json.dumps(value) + "\n").encode("utf-8")
+    
+    @staticmethod
+    def decodeKey(record):
+        return json.loads(record.split(b"\t", 1)[0].decode("utf-8"))
+    
+    @staticmethod
+    def decodeValue(record):
+        return json.loads(record.split(b"\t", 1)[1].decode("utf-8"))
+        
+    def getIndex(self):
+        #Callers hold the lock.
+        if self.index != None: return self.index
+        start = perf_counter()
+        self.index = {}
+        if os.path.exists(self.dsPath):
+            f = open(self.dsPath, "r+b")
+            end = 0
+            for record in f:
+                if not record.endswith(b"\n"): break
+                self.index[LogDataStore.decodeKey(record)] = (end, len(record))
+                end += len(record)
+                self.records += 1
+            if end < os.path.getsize(self.dsPath): f.truncate(end) #Drops a record cut short by a crash
+            f.close()
+        self.loads += 1
+        state.getTracer().span("DataStore.read", "datastore", start, {"app": self.application.name})
+        return self.index
+    
+    def readRecord(self, location):
+        f = open(self.dsPath, "rb")
+        f.seek(location[0])
+        record = f.read(location[1])
+        f.close()
+        return record
+    
+    def getStore(self):
+        #A copy of every key and value; changing it does not change the store.
+        with self.lock:
+            store = {}
+            index = self.getIndex()
+            if len(index) > 0:
+                f = open(self.dsPath, "rb")
+                log = f.read()
+                f.close()
+                for key, (offset, length) in index.items():
+                    store[key] = LogDataStore.decodeValue(log[offset:offset+length])
+            store.update(self.pending)
+            return store
+        
+    def get(self, key, default=None):
+        self.reads += 1
+        with self.lock:
+            if key in self.pending: return self.pending[key]
+            index = self.getIndex()
+            if key not in index: return default
+            return LogDataStore.decodeValue(self.readRecord(index[key]))
+        
+    def set(self, key, value):
+        with self.lock:
+            self.pending[key] = value
+        self.saveStore()
+        
+    def flush(self):
+        if not self.dirty: return
+        start = perf_counter()
+        with self.lock:
+            index = self.getIndex()
+            written = {}
+            logEnd = None
+            try:
+                f = open(self.dsPath, "ab")
+                try:
+                    logEnd = offset = f.seek(0, 2)
+                    for key, value in self.pending.items():
+                        record = LogDataStore.encodeRecord(key, value)
+                        f.write(record)
+                        written[key] = (offset, len(record))
+                        offset += len(record)
+                finally:
+                    f.close()
+            except Exception as error:
+                #Drops the records written so far, so the next append starts on a record boundary.
+                if logEnd != None:
+                    try: os.truncate(self.dsPath, logEnd)
+                    except OSError: pass
+                self.retryFlush(error)
+                return
+            index.update(written)
+            self.records += len(written)
+            self.pending.clear()
+            self.dirty = False #Writes waiting on the lock arm the next flush themselves
+        self.flushes += 1
+        state.getTracer().span("DataStore.write", "datastore", start, {"app": self.application.name})
+        if self.needsCompaction():
+            self.compacting = True
+            state.getExecutor().submit(self.compact, owner=None) #Not cancelled when the app closes
+            
+    def needsCompaction(self):
+        if self.compacting or self.records < settings.get("datastore_compact_min_records", 256): return False
+        return self.records - len(self.index) > self.records * settings.get("datastore_compact_ratio", 0.5)
+    
+    def compact(self):
+        #Live records are copied without holding the lock. Records appended meanwhile are copied after them under it.
+        start = perf_counter()
+        try:
+            with self.lock:
+                live = sorted((location, key) for key, location in self.index.items())
+                end = os.path.getsize(self.dsPath)
+            index = {}
+            offset = 0
+            rf = open(self.dsPath, "rb")
+            wf = open(self.dsPath + ".tmp", "wb")
+            for location, key in live:
+                rf.seek(location[0])
+                wf.write(rf.read(location[1]))
+                index[key] = (offset, location[1])
+                offset += location[1]
+            with self.lock:
+                rf.seek(end)
+                records = len(index)
+                for record in rf:
+                    wf.write(record)
+                    index[LogDataStore.decodeKey(record)] = (offset, len(record))
+                    offset += len(record)
+                    records += 1
+                rf.close()
+                wf.close()
+                os.replace(self.dsPath + ".tmp", self.dsPath)
+                self.index = index
+                self.records = records
+            self.compactions += 1
+            state.getTracer().span("DataStore.compact", "datastore", start, {"app": self.application.name})
+        finally:
+            self.compacting = False
+                
 class State(object):                  
-    def __init__(self, activeApp=None, colors=None, icons=None, controller=None, eventQueue=None, notificationQueue=None, functionbar=None, font=None, tFont=None, gui=None, appList=None, keyboard=None):   
+    def __init__(self, activeApp=None, colors=None, icons=None, controller=None, eventQueue=None, notificationQueue=None, functionbar=None, font=None, tFont=None, gui=None, appList=None, keyboard=None, executor=None, profiler=None, tracer=None, clock=None, manifestIndex=None):   
         self.activeApplication = activeApp
         self.colorPalette = colors
         self.icons = icons
@@ -2582,12 +3976,24 @@ class State(object):
         self.font = font
         self.typingFont = tFont
         self.appList = appList
+        self.manifestIndex = manifestIndex
         self.keyboard = keyboard
+        self.executor = executor
+        self.profiler = profiler
+        self.tracer = tracer
+        self.clock = clock
+        self.uiQueue = deque()
+        self.uiQueueBudget = settings.get("ui_queue_budget_ms", 8) / 1000.0
         self.recentAppSwitcher = None
         if gui == None: self.gui = GUI()
         if colors == None: self.colorPalette = GUI.ColorPalette()
         if icons == None: self.icons = GUI.Icons()
         if controller == None: self.threadController = Controller()
+        if executor == None: self.executor = Executor(settings.get("worker_threads", 4))
+        if profiler == None: self.profiler = Profiler(settings.get("profiler_window", 300))
+        if tracer == None: self.tracer = Tracer(settings.get("trace_buffer_events", 65536))
+        if clock == None: self.clock = Clock()
+        if settings.get("trace_on_start", False): self.tracer.start()
         if eventQueue == None: self.eventQueue = GUI.EventQueue()
         if notificationQueue == None: self.notificationQueue = NotificationQueue()
         if font == None: self.font = GUI.Font()
@@ -2597,6 +4003,10 @@ class State(object):
     def getColorPalette(self): return self.colorPalette
     def getIcons(self): return self.icons
     def getThreadController(self): return self.threadController
+    def getExecutor(self): return self.executor
+    def getProfiler(self): return self.profiler
+    def getTracer(self): return self.tracer
+    def getClock(self): return self.clock
     def getEventQueue(self): return self.eventQueue
     def getNotificationQueue(self): return self.notificationQueue
     def getFont(self): return self.font
@@ -2605,6 +4015,9 @@ class State(object):
     def getApplicationList(self): 
         if self.appList == None: self.appList = ApplicationList()
         return self.appList
+    def getManifestIndex(self):
+        if self.manifestIndex == None: self.manifestIndex = ManifestIndex()
+        return self.manifestIndex
     def getFunctionBar(self):
         if self.functionBar == None: self.functionBar = GUI.FunctionBar()
         return self.functionBar
@@ -2614,6 +4027,12 @@ class State(object):
     def setColorPalette(self, colors): self.colorPalette = colors
     def setIcons(self, icons): self.icons = icons
     def setThreadController(self, controller): self.threadController = controller
+    def setExecutor(self, executor): self.executor = executor
+    def setProfiler(self, profiler): self.profiler = profiler
+    def setTracer(self, tracer): self.tracer = tracer
+    def setClock(self, clock):
+        self.threadController.rebaseTimers(clock.monotonic() - self.clock.monotonic())
+        self.clock = clock
     def setEventQueue(self, queue): self.eventQueue = queue
     def setNotificationQueue(self, queue): self.notificationQueue = queue
     def setFunctionBar(self, bar): self.functionBar = bar
@@ -2621,8 +4040,35 @@ class State(object):
     def setTypingFont(self, tfont): self.typingFont = tfont
     def setGUI(self, gui): self.gui = gui
     def setApplicationList(self, appList): self.appList = appList
+    def setManifestIndex(self, index): self.manifestIndex = index
     def setKeyboard(self, keyboard): self.keyboard = keyboard
     
+    def startTrace(self):
+        #From the state shell: .startTrace(), then .dumpTrace() or .stopTrace(), which return the path written.
+        self.tracer.start()
+        
+    def dumpTrace(self, path=None):
+        #Writes what has been recorded so far and keeps recording.
+        return self.tracer.dump(path)
+    
+    def stopTrace(self, path=None):
+        return self.tracer.stop(path)
+    
+    def postToUI(self, method, *args):
+        #Safe to call from any thread; the call is made on the main loop before the next frame is laid out.
+        self.uiQueue.append((method, args))
+        if self.gui.sleeping: self.gui.wake()
+        
+    def runUIQueue(self):
+        end = monotonic() + self.uiQueueBudget
+        while len(self.uiQueue) > 0:
+            method, args = self.uiQueue.popleft()
+            try:
+                method(*args)
+            except:
+                State.error_recovery("UI update error.", "Posted method: "+str(method))
+            if monotonic() >= end: break
+    
     @staticmethod
     def getState():
         return state
@@ -2630,6 +4076,10 @@ class State(object):
     @staticmethod
     def exit():
         state.getThreadController().stopAllThreads()
+        state.getExecutor().shutdown()
+        DataStore.flushAll()
+        if state.getTracer().recording: state.getTracer().stop()
+        state.getEventQueue().stopRecording()
         pygame.quit()
         os._exit(1)
         
@@ -2640,6 +4090,7 @@ class State(object):
         rClock = pygame.time.Clock()
         state.getNotificationQueue().clear()
         state.getEventQueue().clear()
+        state.getGUI().requestFullRefresh()
         print("Recovery menu entered.")
         while True:
             rClock.tick(10)
@@ -2693,6 +4144,7 @@ class State(object):
     @staticmethod       
     def error_recovery(message="Unknown", data=None):
         print(message)
+        state.getGUI().requestFullRefresh()
         screen.fill([200, 100, 100])
         rf = pygame.font.Font(None, 24)
         sf = pygame.font.Font(None, 18)
@@ -2734,25 +4186,56 @@ class State(object):
     
     @staticmethod
     def main():
+        keyboardShown = False
+        frameStart = None
         while True:
-            #Limit FPS
+            #Event dispatch may end the frame early, so it is timed when the next frame begins
+            if frameStart != None:
+                state.getProfiler().record("dispatch", start)
+                state.getProfiler().record("frame", frameStart)
+                state.getTracer().span("frame", "frame", frameStart)
+            #Sleep while there is nothing to do, then limit FPS
+            state.getGUI().idle()
             state.getGUI().timer.tick(state.getGUI().update_interval)
+            profiler = state.getProfiler()
+            frameStart = start = perf_counter()
             #Update event queue
             state.getEventQueue().check()
-            #Refresh main thread controller
+            start = profiler.record("events", start)
+            #Refresh main thread controller and deliver finished background work
             state.getThreadController().run()
+            start = profiler.record("threads", start)
+            state.getExecutor().run()
+            state.runUIQueue()
+            start = profiler.record("callbacks", start)
+            #Showing or hiding the keyboard moves the app and covers the function bar
+            if keyboardShown != (state.getKeyboard() != None and state.getKeyboard().active):
+                keyboardShown = not keyboardShown
+                state.getGUI().addDirtyRect(screen.get_rect())
             #Paint UI
+            state.getGUI().runLayout()
+            state.getGUI().pollVolatile()
+            start = profiler.record("layout", start)
             if state.getActiveApplication() != None:
                 try:
                     state.getActiveApplication().ui.render()
                 except:
                     State.error_recovery("UI error.", "FPS: "+str(state.getGUI().update_interval))
                     Application.fullCloseCurrent()
+            start = profiler.record("render:app", start)
             state.getFunctionBar().render()
+            start = profiler.record("render:bar", start)
             if state.getKeyboard() != None and state.getKeyboard().active:
                 state.getKeyboard().render(screen)
+                start = profiler.record("render:keyboard", start)
+            if state.getFunctionBar().performanceOverlay.displayed:
+                state.getFunctionBar().performanceOverlay.render()
+                start = profiler.record("render:overlay", start)
             
             state.getGUI().refresh()
+            start = profiler.record("flip", start)
+            state.getThreadController().runIdle(1.0 / state.getGUI().update_interval)
+            start = profiler.record("idle threads", start)
             #Check Events
             latestEvent = state.getEventQueue().getLatestComplete()
             if latestEvent != None:
@@ -2770,22 +4253,27 @@ class State(object):
                     if clickedChild == None and state.getKeyboard().textEntryField.computedPosition == [0, 0] and state.getKeyboard().textEntryField.checkClick(latestEvent):
                         clickedChild = state.getKeyboard().textEntryField
                 else:
-                    if latestEvent.pos[1] < state.getGUI().height - 40:
+                    if state.getFunctionBar().performanceOverlay.displayed and state.getFunctionBar().performanceOverlay.container.checkClick(latestEvent):
+                        clickedChild = state.getFunctionBar().performanceOverlay.container.getClickedChild(latestEvent)
+                    elif latestEvent.pos[1] < state.getGUI().height - 40:
                         if state.getActiveApplication() != None:
                             clickedChild = state.getActiveApplication().ui.getClickedChild(latestEvent)
                     else:
                         clickedChild = state.getFunctionBar().container.getClickedChild(latestEvent)
                 if clickedChild != None:
+                    if isinstance(latestEvent, GUI.LongClickEvent):
+                        handler = "onLongClick"
+                    elif isinstance(latestEvent, GUI.IntermediateUpdateEvent):
+                        handler = "onIntermediateUpdate"
+                    else:
+                        handler = "onClick"
+                    handlerStart = perf_counter()
                     try:
-                        if isinstance(latestEvent, GUI.LongClickEvent):
-                            clickedChild.onLongClick()
-                        else:
-                            if isinstance(latestEvent, GUI.IntermediateUpdateEvent):
-                                clickedChild.onIntermediateUpdate()
-                            else:
-                                clickedChild.onClick()
+                        getattr(clickedChild, handler)()
+                        clickedChild.markDirty()
                     except:
                         State.error_recovery("Event execution error", "Click event: "+str(latestEvent))
+                    state.getTracer().span(handler, "event", handlerStart, {"component": type(clickedChild).__name__})
             
     @staticmethod
     def state_shell():
@@ -2814,12 +4302,15 @@ if __name__ == "__main__":
     #TEST
     #print(state)
     for app in state.getApplicationList().getApplicationList():
-        if app.evtHandlers.get("onOSLaunch", None) != None:
-            try:
-                app.evtHandlers.get("onOSLaunch")()
-            except:
-                State.error_recovery("App startup task failed to run properly.", "App: " + str(app.name))             
+        try:
+            app.onOSLaunch()
+        except:
+            State.error_recovery("App startup task failed to run properly.", "App: " + str(app.name))             
     state.getApplicationList().getApp("home").activate()
+    if settings.get("record_events", False):
+        state.getEventQueue().startRecording()
+    if settings.get("replay_events", "") != "":
+        state.getEventQueue().startReplay(settings.get("replay_events"), settings.get("replay_speed", 1.0))
     try:
         State.main()
     except:
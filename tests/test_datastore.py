@@ -0,0 +1,190 @@
+import os
+import json
+import shutil
+import unittest
+from unittest import mock
+from tempfile import mkdtemp
+
+from benchmarks import harness
+
+import pyos
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+class DataStoreFlushTest(unittest.TestCase):
+    def setUp(self):
+        self.cwd = os.getcwd()
+        os.chdir(ROOT)
+        self.state = harness.boot()
+        self.path = mkdtemp()
+        self.app = self.state.getApplicationList().getApp("todo")
+
+    def tearDown(self):
+        self.state.getExecutor().shutdown()
+        shutil.rmtree(self.path)
+        os.chdir(self.cwd)
+
+    def makeStore(self, storeClass, name):
+        store = storeClass(self.app)
+        store.dsPath = os.path.join(self.path, name)
+        return store
+
+    def test_failed_flush_keeps_the_store_dirty(self):
+        store = self.makeStore(pyos.DataStore, "todo.ds")
+        store["good"] = 1
+        store["bad"] = object()
+        store.flush()
+        self.assertTrue(store.dirty)
+        self.assertFalse(os.path.exists(store.dsPath))
+        store["bad"] = 2
+        store.flush()
+        self.assertFalse(store.dirty)
+        f = open(store.dsPath)
+        self.assertEqual(json.load(f), {"dsApp": "todo", "good": 1, "bad": 2})
+        f.close()
+
+    def test_failed_log_flush_keeps_pending_records(self):
+        store = self.makeStore(pyos.LogDataStore, "todo.dslog")
+        store["good"] = 1
+        store["bad"] = object()
+        store.flush()
+        self.assertTrue(store.dirty)
+        self.assertEqual(os.path.getsize(store.dsPath), 0)
+        store["bad"] = 2
+        store.flush()
+        self.assertFalse(store.dirty)
+        reopened = self.makeStore(pyos.LogDataStore, "todo.dslog")
+        self.assertEqual(reopened.getStore(), {"good": 1, "bad": 2})
+
+class LogDataStoreTest(unittest.TestCase):
+    def setUp(self):
+        self.cwd = os.getcwd()
+        os.chdir(ROOT)
+        self.state = harness.boot()
+        self.path = mkdtemp()
+        self.app = self.state.getApplicationList().getApp("todo")
+        pyos.settings["datastore_compact_min_records"] = 8
+        pyos.settings["datastore_compact_ratio"] = 0.5
+
+    def tearDown(self):
+        self.state.getExecutor().shutdown()
+        shutil.rmtree(self.path)
+        os.chdir(self.cwd)
+
+    def makeStore(self):
+        store = pyos.LogDataStore(self.app)
+        store.dsPath = os.path.join(self.path, "todo.dslog")
+        return store
+
+    def readLog(self, store):
+        f = open(store.dsPath, "rb")
+        records = [(pyos.LogDataStore.decodeKey(record), pyos.LogDataStore.decodeValue(record)) for record in f]
+        f.close()
+        return records
+
+    def test_reopened_store_rebuilds_its_index(self):
+        store = self.makeStore()
+        store["a"] = 1
+        store["b"] = [2, 3]
+        store.flush()
+        f = open(store.dsPath, "ab")
+        f.write(b'"c"\t4') #A record cut short by a crash
+        f.close()
+        reopened = self.makeStore()
+        self.assertEqual(reopened.getStore(), {"a": 1, "b": [2, 3]})
+        self.assertEqual(reopened.records, 2)
+        self.assertEqual(self.readLog(reopened), [("a", 1), ("b", [2, 3])])
+        reopened["c"] = 5
+        reopened.flush()
+        self.assertEqual(self.makeStore().getStore(), {"a": 1, "b": [2, 3], "c": 5})
+
+    def test_values_are_read_from_the_log_when_asked_for(self):
+        store = self.makeStore()
+        store["a"] = "first"
+        store["b"] = "second"
+        store.flush()
+        reopened = self.makeStore()
+        with mock.patch.object(reopened, "readRecord", wraps=reopened.readRecord) as readRecord:
+            self.assertEqual(reopened.get("missing", "default"), "default")
+            self.assertEqual(readRecord.call_count, 0)
+            self.assertEqual(reopened["b"], "second")
+            self.assertEqual(readRecord.call_count, 1)
+            self.assertEqual(reopened["a"], "first")
+            self.assertEqual(readRecord.call_count, 2)
+        self.assertEqual(reopened.loads, 1)
+
+    def test_last_write_wins(self):
+        store = self.makeStore()
+        store["a"] = 1
+        store.flush()
+        store["a"] = 2
+        store.flush()
+        store["a"] = 3
+        self.assertEqual(store["a"], 3) #Pending writes are served before the log
+        store.flush()
+        self.assertEqual(self.readLog(store), [("a", 1), ("a", 2), ("a", 3)])
+        self.assertEqual(store["a"], 3)
+        self.assertEqual(self.makeStore()["a"], 3)
+
+    def test_compaction_waits_for_enough_overwritten_records(self):
+        store = self.makeStore()
+        with mock.patch.object(self.state.getExecutor(), "submit") as submit:
+            for value in range(3):
+                store["a"] = value
+                store.flush()
+            self.assertEqual(submit.call_count, 0) #Fewer than datastore_compact_min_records
+            for key in "bcdefg":
+                store[key] = 0
+                store.flush()
+            self.assertEqual(store.records, 9)
+            self.assertEqual(submit.call_count, 0) #2 of 9 records overwritten, under datastore_compact_ratio
+            for value in range(5):
+                store["b"] = value
+                store.flush()
+            self.assertEqual(submit.call_count, 0) #7 of 14 records overwritten is not past half
+            store["b"] = 5
+            store.flush()
+            self.assertEqual(submit.call_count, 1) #8 of 15
+            self.assertTrue(store.compacting)
+            store["c"] = 1
+            store.flush()
+            self.assertEqual(submit.call_count, 1) #Not started again while one is running
+        submit.call_args[0][0]()
+        self.assertFalse(store.compacting)
+        self.assertEqual(store.compactions, 1)
+        expected = {"a": 2, "b": 5, "c": 1, "d": 0, "e": 0, "f": 0, "g": 0}
+        self.assertEqual(store.records, 7)
+        self.assertEqual(dict(self.readLog(store)), expected)
+        self.assertEqual(len(self.readLog(store)), 7)
+        self.assertEqual(store.getStore(), expected)
+        self.assertEqual(self.makeStore().getStore(), expected)
+
+    def test_writes_during_compaction_are_kept(self):
+        store = self.makeStore()
+        store["b"] = 0
+        store.flush()
+        with mock.patch.object(self.state.getExecutor(), "submit") as submit:
+            for value in range(8):
+                store["a"] = value
+                store.flush()
+        self.assertEqual(submit.call_count, 1)
+        compact = submit.call_args[0][0]
+        tmpPath = store.dsPath + ".tmp"
+        def openDuringCompaction(path, mode="r"):
+            if path == tmpPath:
+                #The live records have been listed and the lock is free, as it is while a worker copies them.
+                store["a"] = "during"
+                store["c"] = "new"
+                store.flush()
+            return open(path, mode)
+        with mock.patch.object(pyos, "open", openDuringCompaction, create=True):
+            compact()
+        self.assertEqual(store.compactions, 1)
+        expected = {"a": "during", "b": 0, "c": "new"}
+        self.assertEqual(store.getStore(), expected)
+        self.assertEqual(self.readLog(store), [("b", 0), ("a", 7), ("a", "during"), ("c", "new")])
+        self.assertEqual(store.records, 4)
+        self.assertEqual(self.makeStore().getStore(), expected)
+
+if __name__ == "__main__":
+    unittest.main()
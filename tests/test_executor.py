@@ -0,0 +1,53 @@
+import os
+import time
+import unittest
+from threading import Event
+
+from benchmarks import harness
+
+import pyos
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+class ExecutorTest(unittest.TestCase):
+    def setUp(self):
+        self.cwd = os.getcwd()
+        os.chdir(ROOT)
+        self.state = harness.boot()
+        self.executor = pyos.Executor(1)
+
+    def tearDown(self):
+        self.executor.shutdown()
+        self.state.getExecutor().shutdown()
+        os.chdir(self.cwd)
+
+    def runUntilDone(self, *futures):
+        while not all(future.done() for future in futures):
+            time.sleep(0.01)
+        self.executor.run()
+
+    def test_cancelled_work_drops_its_callbacks(self):
+        release = Event()
+        running = self.executor.submit(release.wait, 5)
+        queued = self.executor.submit(lambda: True)
+        called = []
+        running.add_done_callback(lambda future: called.append("running"))
+        queued.add_done_callback(lambda future: called.append(future.result()))
+        self.executor.cancelAll()
+        release.set()
+        self.runUntilDone(running.future, queued.future)
+        self.assertTrue(queued.cancelled())
+        self.assertTrue(running.cancelled()) #Abandoned, as it had already started
+        self.assertEqual(called, [])
+        queued.add_done_callback(lambda future: called.append(future.result()))
+        self.assertEqual(called, [])
+
+    def test_callbacks_run_on_completion(self):
+        future = self.executor.submit(lambda: 42)
+        called = []
+        future.add_done_callback(lambda future: called.append(future.result()))
+        self.runUntilDone(future.future)
+        self.assertEqual(called, [42])
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,33 @@
+import os
+import unittest
+
+from benchmarks import harness
+
+import pyos
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+class IdleTest(unittest.TestCase):
+    def setUp(self):
+        self.cwd = os.getcwd()
+        os.chdir(ROOT)
+        self.state = harness.boot()
+        harness.runFrames(self.state, harness.Script())
+
+    def tearDown(self):
+        self.state.getExecutor().shutdown()
+        os.chdir(self.cwd)
+
+    def test_idle_resumes_after_canvas_app_is_paused(self):
+        gui = self.state.getGUI()
+        picasso = self.state.getApplicationList().getApp("picasso")
+        picasso.activate()
+        harness.runFrames(self.state, harness.Script())
+        self.assertEqual(gui.getWaitTime(), 0)
+        self.state.getApplicationList().getApp("home").activate()
+        harness.runFrames(self.state, harness.Script())
+        self.assertIn(picasso, self.state.getApplicationList().activeApplications)
+        self.assertEqual(gui.getWaitTime(), None)
+
+if __name__ == "__main__":
+    unittest.main()
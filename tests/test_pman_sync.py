@@ -0,0 +1,62 @@
+import os
+import shutil
+import unittest
+from tempfile import mkdtemp
+from threading import Thread
+
+from benchmarks.pman_sync import buildFixture, FixtureServer
+from apps.pman import Fetcher, syncRepositories
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+class PManSyncTest(unittest.TestCase):
+    def setUp(self):
+        self.cwd = os.getcwd()
+        os.chdir(ROOT)
+        self.path = mkdtemp()
+        self.names = buildFixture(self.path, 12)
+        self.server = FixtureServer(self.path, 0)
+        Thread(target=self.server.serve_forever, daemon=True).start()
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+        shutil.rmtree(self.path)
+        os.chdir(self.cwd)
+
+    def sync(self, workers):
+        skipped = []
+        def report(text):
+            if text.startswith("!!!"): skipped.append(text)
+        fetcher = Fetcher(workers)
+        try:
+            packages, featured = syncRepositories([self.server.getURL("repo"), self.server.getURL("broken")], fetcher, report)
+        finally:
+            fetcher.close()
+        return packages, featured, skipped
+
+    def test_sync_fetches_the_fixture(self):
+        packages, featured, skipped = self.sync(4)
+        self.assertEqual(sorted(packages.keys()), self.names)
+        self.assertIn("paquete-año", packages)
+        self.assertEqual(packages["package0003"]["title"], "Notes 3")
+        self.assertEqual(featured, self.names[:2])
+
+    def test_sync_skips_the_malformed_entries(self):
+        packages, featured, skipped = self.sync(4)
+        self.assertEqual(len(skipped), 3)
+        for entry in ["broken", "missing", "malformed"]:
+            self.assertEqual(len([text for text in skipped if entry in text]), 1, skipped)
+        self.assertNotIn("missing", packages)
+        self.assertNotIn("malformed", packages)
+
+    def test_sync_reuses_connections(self):
+        for workers in [1, 4]:
+            self.server.reset()
+            self.sync(workers)
+            self.assertEqual(self.server.counters["requests"], 2 + len(self.names) + 2)
+            self.assertLess(self.server.counters["connections"], self.server.counters["requests"])
+            self.assertLessEqual(self.server.counters["connections"], workers * 2)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,44 @@
+import unittest
+from collections import deque
+
+import pyos
+
+class ProfilerTest(unittest.TestCase):
+    def setUp(self):
+        self.profiler = pyos.Profiler(10)
+
+    def setSamples(self, phase, samples):
+        self.profiler.phases[phase] = deque(samples, maxlen=self.profiler.window)
+
+    def test_percentiles_of_a_small_window_include_an_outlier(self):
+        #One long frame among two short ones is the slowest third, so it is p95 and p99.
+        self.setSamples("frame", [1.9, 9843.0, 2.0])
+        report = self.profiler.getPercentiles("frame")
+        self.assertEqual(report["p50"], 2.0)
+        self.assertEqual(report["p95"], 9843.0)
+        self.assertEqual(report["p99"], 9843.0)
+        self.assertEqual(report["max"], 9843.0)
+        self.assertEqual(report["samples"], 3)
+
+    def test_percentiles_use_nearest_rank(self):
+        self.setSamples("frame", [float(sample) for sample in range(10, 0, -1)])
+        report = self.profiler.getPercentiles("frame")
+        self.assertEqual(report["p50"], 5.0)
+        self.assertEqual(report["p95"], 10.0)
+        self.assertEqual(report["p99"], 10.0)
+
+    def test_single_sample(self):
+        self.setSamples("frame", [4.0])
+        report = self.profiler.getPercentiles("frame")
+        self.assertEqual((report["p50"], report["p95"], report["p99"], report["max"]), (4.0, 4.0, 4.0, 4.0))
+
+    def test_unknown_phase(self):
+        self.assertEqual(self.profiler.getPercentiles("frame"), None)
+
+    def test_window_drops_old_samples(self):
+        for sample in range(15):
+            self.profiler.record("frame", pyos.perf_counter())
+        self.assertEqual(self.profiler.getPercentiles("frame")["samples"], 10)
+
+if __name__ == "__main__":
+    unittest.main()
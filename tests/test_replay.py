@@ -0,0 +1,47 @@
+import os
+import unittest
+from tempfile import mkstemp
+
+import pygame
+
+from benchmarks import harness
+
+import pyos
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+class ReplayClockTest(unittest.TestCase):
+    def setUp(self):
+        self.cwd = os.getcwd()
+        os.chdir(ROOT)
+        self.state = harness.boot()
+        handle, self.path = mkstemp(suffix=".evlog")
+        os.close(handle)
+        f = open(self.path, "wb")
+        f.write(pyos.GUI.EventRecorder.MAGIC)
+        f.write(pyos.GUI.EventRecorder.RECORD.pack(0.1, pyos.GUI.EventRecorder.TYPES.index(pygame.MOUSEMOTION), 10, 10, 0))
+        f.close()
+
+    def tearDown(self):
+        self.state.getExecutor().shutdown()
+        os.remove(self.path)
+        os.chdir(self.cwd)
+
+    def test_clock_runs_again_after_replay(self):
+        clock = self.state.getClock()
+        queue = self.state.getEventQueue()
+        queue.startReplay(self.path, 0)
+        self.assertIsInstance(self.state.getClock(), pyos.FixedClock)
+        script = harness.Script()
+        script.waitUntil(lambda: queue.replay == None)
+        harness.runFrames(self.state, script)
+        self.assertIs(self.state.getClock(), clock)
+        called = []
+        self.state.getThreadController().callLater(0.05, called.append, True)
+        script = harness.Script()
+        script.waitUntil(lambda: called != [])
+        harness.runFrames(self.state, script)
+        self.assertEqual(called, [True])
+
+if __name__ == "__main__":
+    unittest.main()
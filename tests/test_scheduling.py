@@ -0,0 +1,32 @@
+import os
+import unittest
+
+from benchmarks import harness
+
+import pyos
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+class SchedulingTest(unittest.TestCase):
+    def setUp(self):
+        self.cwd = os.getcwd()
+        os.chdir(ROOT)
+        self.state = harness.boot()
+        harness.runFrames(self.state, harness.Script())
+
+    def tearDown(self):
+        self.state.getExecutor().shutdown()
+        os.chdir(self.cwd)
+
+    def test_reopened_app_keeps_its_scheduling_class(self):
+        clock = self.state.getApplicationList().getApp("clock")
+        clock.activate()
+        harness.runFrames(self.state, harness.Script())
+        self.assertEqual(clock.thread.schedulingClass, pyos.Thread.BACKGROUND)
+        pyos.Application.fullCloseCurrent()
+        harness.runFrames(self.state, harness.Script())
+        clock.activate()
+        self.assertEqual(clock.thread.schedulingClass, pyos.Thread.BACKGROUND)
+
+if __name__ == "__main__":
+    unittest.main()